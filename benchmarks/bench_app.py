@@ -0,0 +1,249 @@
+"""
+Sanic-Cors end-to-end benchmark
+===============================
+Measures the per-request overhead of Sanic-CORS in a real Sanic app, with
+and without the CORS extension installed, and with the CORS headers added by
+a response middleware or by a response signal handler.
+
+The apps are configured like examples/app_based_example.py (CORS on the app,
+for r'/api/*') and examples/blueprints_based_example.py (CORS on a
+blueprint). Each is driven in-process through its ASGI interface, without
+sockets or an HTTP client, so the timings are dominated by Sanic and its
+middleware. Requests are sent with a fixed number in flight, in a mix of
+simple CORS requests, preflights and requests without an Origin header.
+
+Run it with:
+
+    $ python benchmarks/bench_app.py
+    $ python benchmarks/bench_app.py --requests 20000 --concurrency 256
+    $ python benchmarks/bench_app.py --apps app --variants no-cors cors cors-signals
+
+For each app, mix and variant it reports requests/s, and the p50 and p99
+latency.
+
+:copyright: (c) 2022 by Ashley Sommer (based on flask-cors by Cory Dolphin).
+:license: MIT/X11, see LICENSE for more details.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+from sanic import Sanic, Blueprint
+from sanic.response import json, text
+try:
+    from sanic_cors import CORS  # The typical way to import sanic-cors
+except ImportError:
+    # Path hack allows benchmarks to be run without installation.
+    import os
+    parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.sys.path.insert(0, parentdir)
+    from sanic_cors import CORS
+
+ORIGIN = b'https://www.examplesite.com'
+
+# (name, method, path, extra headers)
+SIMPLE = ('simple', 'GET', '/api/v1/users/', [(b'origin', ORIGIN)])
+PREFLIGHT = ('preflight', 'OPTIONS', '/api/v1/users/create',
+             [(b'origin', ORIGIN),
+              (b'access-control-request-method', b'POST'),
+              (b'access-control-request-headers', b'Content-Type')])
+NO_ORIGIN = ('no-origin', 'GET', '/api/v1/users/', [])
+NOT_CORS = ('not-cors', 'GET', '/', [(b'origin', ORIGIN)])
+MIXES = {
+    'simple': [SIMPLE],
+    'preflight': [PREFLIGHT],
+    'no-origin': [NO_ORIGIN],
+    'not-cors': [NOT_CORS],
+    'mixed': [SIMPLE, SIMPLE, PREFLIGHT, NO_ORIGIN, NO_ORIGIN, NOT_CORS],
+}
+
+# The options of the CORS extension in each variant, or None for no CORS
+VARIANTS = {
+    'no-cors': None,
+    'cors': {},
+    'cors-signals': {'signals': True},
+}
+
+_app_ids = itertools.count()
+
+
+def app_based(cors_options):
+    app = Sanic('SanicCorsBenchApp{:d}'.format(next(_app_ids)), configure_logging=False)
+    if cors_options is not None:
+        CORS(app, resources=r'/api/*', origins="*", methods=["GET", "POST", "HEAD", "OPTIONS"],
+             **cors_options)
+
+    @app.route("/")
+    def hello_world(request):
+        return text('Hello CORS!')
+
+    @app.route("/api/v1/users/", methods=['GET'])
+    def list_users(request):
+        return json({"user": "joe"})
+
+    @app.route("/api/v1/users/create", methods=['POST', 'OPTIONS'])
+    def create_user(request):
+        return json({"success": True})
+
+    return app
+
+
+def blueprints_based(cors_options):
+    name = next(_app_ids)
+    api_v1 = Blueprint('api_v1_{:d}'.format(name), None)
+    if cors_options is not None:
+        CORS(api_v1, **cors_options)
+
+    @api_v1.route("/api/v1/users/", methods=['GET', 'OPTIONS'])
+    def list_users(request):
+        return json({"user": "joe"})
+
+    @api_v1.route("/api/v1/users/create", methods=['POST', 'OPTIONS'])
+    def create_user(request):
+        return json({"success": True})
+
+    public_routes = Blueprint('public_{:d}'.format(name), None)
+
+    @public_routes.route("/")
+    def hello_world(request):
+        return text('Hello CORS!')
+
+    app = Sanic('SanicCorsBenchBlueprints{:d}'.format(name), configure_logging=False)
+    app.blueprint(api_v1)
+    app.blueprint(public_routes)
+    return app
+
+
+APPS = {'app': app_based, 'blueprints': blueprints_based}
+# Signals only apply to the extension on an app
+APP_VARIANTS = {'app': list(VARIANTS), 'blueprints': ['no-cors', 'cors']}
+
+
+class Lifespan(object):
+    """Runs the ASGI lifespan protocol of an app, to start it up and shut it down."""
+
+    def __init__(self, app):
+        self.app = app
+        self.events = asyncio.Queue()
+        self.replies = asyncio.Queue()
+        self.task = None
+
+    async def send_event(self, event):
+        await self.events.put({'type': 'lifespan.{}'.format(event)})
+        reply = await self.replies.get()
+        if reply['type'].endswith('.failed'):
+            raise RuntimeError(reply.get('message'))
+
+    async def startup(self):
+        scope = {'type': 'lifespan', 'asgi': {'version': '3.0'}}
+        self.task = asyncio.ensure_future(self.app(scope, self.events.get, self.replies.put))
+        await self.send_event('startup')
+
+    async def shutdown(self):
+        await self.send_event('shutdown')
+        # Some Sanic versions raise once the lifespan protocol has finished,
+        # which ASGI servers ignore
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+async def request(app, method, path, headers):
+    """Sends one request to the app, and returns its status and latency."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('ascii'),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost')] + headers,
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = []
+
+    async def receive():
+        if body:
+            return body.pop()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return status[0] if status else None, time.perf_counter() - start
+
+
+async def run(app, mix, total, concurrency):
+    requests = itertools.islice(itertools.cycle(mix), total)
+    latencies = []
+
+    async def worker():
+        for _, method, path, headers in requests:
+            status, latency = await request(app, method, path, headers)
+            if status is None or status >= 400:
+                raise RuntimeError("{} {} returned {}".format(method, path, status))
+            latencies.append(latency)
+
+    # Warm up the app, and any caches, before timing
+    for _, method, path, headers in mix:
+        await request(app, method, path, headers)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (len(latencies) / elapsed,
+            latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))])
+
+
+async def bench(args):
+    for app_name, mix_name in itertools.product(args.apps, args.mixes):
+        variants = [v for v in args.variants if v in APP_VARIANTS[app_name]]
+        results = {}
+        for variant in variants:
+            app = APPS[app_name](VARIANTS[variant])
+            lifespan = Lifespan(app)
+            await lifespan.startup()
+            try:
+                results[variant] = await run(app, MIXES[mix_name], args.requests, args.concurrency)
+            finally:
+                await lifespan.shutdown()
+        for variant in variants:
+            rps, p50, p99 = results[variant]
+            print("{:<10s} {:<9s} {:<12s} {:>9.0f} req/s  p50 {:>8.1f} us  p99 {:>8.1f} us".format(
+                app_name, mix_name, variant, rps, p50 * 1e6, p99 * 1e6))
+        if 'no-cors' not in results:
+            continue
+        for variant in variants:
+            if variant == 'no-cors':
+                continue
+            overhead = 1e6 / results[variant][0] - 1e6 / results['no-cors'][0]
+            print("{:<10s} {:<9s} {:<12s} CORS overhead {:.1f} us/request".format(
+                app_name, mix_name, variant, overhead))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[4])
+    parser.add_argument('--requests', type=int, default=10000,
+                        help='requests per app and mix')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='requests in flight at once')
+    parser.add_argument('--apps', nargs='+', choices=sorted(APPS), default=sorted(APPS))
+    parser.add_argument('--mixes', nargs='+', choices=sorted(MIXES), default=sorted(MIXES))
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=['no-cors', 'cors'])
+    args = parser.parse_args(argv)
+    logging.getLogger('sanic').setLevel(logging.WARNING)
+    Sanic.test_mode = True
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Sanic-Cors core benchmarks
+==========================
+Micro-benchmarks of the functions which compute the CORS headers for a
+request: get_cors_headers, get_cors_origins, get_allow_headers,
+try_match_any and set_cors_headers.
+
+Each benchmark is run against 1, 50 and 1000 allowed origins, either all
+literal or mixed literal and regex, with credentials on and off, for simple
+and preflight requests. The request's origin is either the last allowed
+literal origin, which is the worst case for a linear scan, an origin which
+only the last regex matches, or an origin which matches nothing.
+
+Run it with:
+
+    $ python benchmarks/bench_core.py
+    $ python benchmarks/bench_core.py --no-cache --filter get_cors_headers
+
+Results are the best of a number of repeats, in microseconds per call, so
+they can be compared between commits and releases on the same machine.
+
+:copyright: (c) 2022 by Ashley Sommer (based on flask-cors by Cory Dolphin).
+:license: MIT/X11, see LICENSE for more details.
+"""
+import argparse
+import itertools
+import timeit
+from types import SimpleNamespace
+
+from sanic.response import HTTPResponse
+try:
+    from sanic_cors import core  # The typical way to import sanic-cors
+except ImportError:
+    # Path hack allows benchmarks to be run without installation.
+    import os
+    parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.sys.path.insert(0, parentdir)
+    from sanic_cors import core
+
+ORIGIN_COUNTS = (1, 50, 1000)
+ALLOW_HEADERS = ['Content-Type', 'X-Requested-With', r'X-Custom-.*']
+REQUEST_HEADERS = 'content-type, x-custom-id, x-requested-with'
+
+
+MISSING_ORIGIN = 'https://unknown.example.org'
+
+
+def make_origins(count, mixed):
+    """
+    Returns `count` allowed origins. When `mixed`, every other origin is a
+    regular expression, but the last one is always a literal.
+    """
+    origins = []
+    for i in range(count):
+        if mixed and (count - i) % 2 == 0:
+            origins.append(r'https://.*\.tenant{:d}\.example\.com'.format(i))
+        else:
+            origins.append('https://app{:d}.example.com'.format(i))
+    return origins
+
+
+def make_request_origins(count, mixed):
+    """
+    Returns (kind, origin) for the request origins to try against
+    `make_origins(count, mixed)`: the last literal, a match of the last
+    regex if there is one, and a miss.
+    """
+    request_origins = [('literal', 'https://app{:d}.example.com'.format(count - 1))]
+    if mixed:
+        request_origins.append(('regex', 'https://app.tenant{:d}.example.com'.format(count - 2)))
+    request_origins.append(('miss', MISSING_ORIGIN))
+    return request_origins
+
+
+def make_policy(origins, credentials, cache_size):
+    return core.get_cors_options(None, dict(origins=origins,
+                                            allow_headers=ALLOW_HEADERS,
+                                            supports_credentials=credentials,
+                                            max_age=600,
+                                            cache_size=cache_size))
+
+
+def make_request_headers(origin, preflight):
+    headers = core.CIMultiDict(Origin=origin)
+    if preflight:
+        headers[core.ACL_REQUEST_METHOD] = 'POST'
+        headers[core.ACL_REQUEST_HEADERS] = REQUEST_HEADERS
+    return headers
+
+
+def scenarios(cache_size):
+    """
+    Yields (name, label, statement) for every benchmark and input.
+    """
+    for count, mixed, credentials, preflight in itertools.product(
+            ORIGIN_COUNTS, (False, True), (False, True), (False, True)):
+        if mixed and count < 2:
+            # One origin cannot be both a literal and a regex
+            continue
+        origins = make_origins(count, mixed)
+        policy = make_policy(origins, credentials, cache_size)
+        method = 'OPTIONS' if preflight else 'GET'
+        for kind, origin in make_request_origins(count, mixed):
+            for name, statement in origin_scenarios(policy, origins, origin, method, preflight, credentials):
+                label = "origins={:<4d} {:<7s} credentials={:<3s} {:<9s} origin={}".format(
+                    count, 'mixed' if mixed else 'literal',
+                    'on' if credentials else 'off',
+                    'preflight' if preflight else 'simple', kind)
+                yield name, label, statement
+        if count == ORIGIN_COUNTS[0] and not mixed and not credentials and not preflight:
+            yield ('get_allow_headers', 'allow_headers={!r}'.format(ALLOW_HEADERS),
+                   lambda p=policy: core.get_allow_headers(p, REQUEST_HEADERS))
+
+
+def origin_scenarios(policy, origins, origin, method, preflight, credentials):
+    """
+    Yields (name, statement) for every benchmark of one request origin.
+    """
+    headers = make_request_headers(origin, preflight)
+    request = SimpleNamespace(headers=headers, method=method)
+    yield ('get_cors_headers',
+           lambda p=policy, h=headers, m=method: core.get_cors_headers(p, h, m))
+    yield ('set_cors_headers',
+           lambda p=policy, r=request: core.set_cors_headers(r, HTTPResponse(), None, p))
+    if preflight or credentials:
+        # These do not depend on the request kind, or on credentials
+        return
+    yield ('get_cors_origins',
+           lambda p=policy, o=origin: core.get_cors_origins(p, o))
+    yield ('try_match_any',
+           lambda o=origins, r=origin: core.try_match_any(r, o))
+
+
+def bench(statement, repeat, min_time):
+    timer = timeit.Timer(statement)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[4])
+    parser.add_argument('--no-cache', action='store_true',
+                        help='disable the per-policy caches (cache_size=0)')
+    parser.add_argument('--filter', default=None,
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='approximate seconds per repeat')
+    args = parser.parse_args(argv)
+
+    cache_size = 0 if args.no_cache else core.DEFAULT_OPTIONS['cache_size']
+    print("cache_size={}".format(cache_size))
+    for name, label, statement in sorted(scenarios(cache_size), key=lambda s: s[0]):
+        if args.filter and args.filter not in name:
+            continue
+        usec = bench(statement, args.repeat, args.min_time)
+        print("{:<18s} {:<64s} {:>10.2f} us".format(name, label, usec))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,11 @@
     :copyright: (c) 2022 by Ashley Sommer (based on flask-cors by Cory Dolphin).
     :license: MIT, see LICENSE for more details.
 """
-from .decorator import cross_origin
+from .decorator import cross_origin, invalidate_cross_origin, no_cors
 from .extension import CORS
 from .version import __version__
 
-__all__ = ['CORS', 'cross_origin']
+__all__ = ['CORS', 'cross_origin', 'invalidate_cross_origin', 'no_cors']
 
 # Set default logging handler to avoid "No handler found" warnings.
 import logging
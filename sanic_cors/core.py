@@ -10,6 +10,9 @@
 import re
 import logging
 import collections
+from bisect import bisect_left
+from collections import OrderedDict
+from time import perf_counter
 from datetime import timedelta
 from typing import Dict
 try:
@@ -43,13 +46,12 @@ CONFIG_OPTIONS = ['CORS_ORIGINS', 'CORS_METHODS', 'CORS_ALLOW_HEADERS',
                   'CORS_MAX_AGE', 'CORS_SEND_WILDCARD',
                   'CORS_AUTOMATIC_OPTIONS', 'CORS_VARY_HEADER',
                   'CORS_RESOURCES', 'CORS_INTERCEPT_EXCEPTIONS',
-                  'CORS_ALWAYS_SEND']
-# Attribute added to request object by decorator to indicate that CORS
-# was evaluated, in case the decorator and extension are both applied
-# to a view.
-# TODO: Refactor these two flags down into one flag.
-SANIC_CORS_EVALUATED = '_sanic_cors_e'
-SANIC_CORS_SKIP_RESPONSE_MIDDLEWARE = "_sanic_cors_srm"
+                  'CORS_ALWAYS_SEND', 'CORS_CACHE_SIZE', 'CORS_ROUTE_CACHE',
+                  'CORS_METRICS', 'CORS_PREFLIGHT_ROUTES', 'CORS_SIGNALS']
+# Attribute added to the request context, holding the CorsRequestState of
+# the request, e.g. to indicate that CORS was evaluated, in case the
+# decorator and extension are both applied to a view.
+SANIC_CORS_STATE = '_sanic_cors_state'
 
 # Strange, but this gets the type of a compiled regex, which is otherwise not
 # exposed in a public API.
@@ -65,7 +67,15 @@ DEFAULT_OPTIONS = dict(origins='*',
                        vary_header=True,
                        resources=r'/*',
                        intercept_exceptions=True,
-                       always_send=True)
+                       always_send=True,
+                       cache_size=256,
+                       route_cache=False,
+                       metrics=False,
+                       preflight_routes=False,
+                       signals=False)
+
+# Marker for a missing cache entry, as None is a valid cached value.
+_MISSING = object()
 
 
 def parse_resources(resources):
@@ -100,6 +110,146 @@ def parse_resources(resources):
         raise ValueError("Unexpected value for resources argument.")
 
 
+# Characters which end the literal prefix of a regular expression
+_REGEX_SPECIAL_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def get_literal_prefix(maybe_regex):
+    """
+    Returns the literal text which any string matched by the given regular
+    expression must start with, when compared case-insensitively. This is
+    an empty string when the pattern does not start with plain text, or it
+    cannot be worked out safely.
+
+    :param maybe_regex: regular expression to inspect
+    :type maybe_regex: _sre.SRE_Pattern or str
+    :rtype: str
+    """
+    if isinstance(maybe_regex, RegexObject):
+        if maybe_regex.flags & re.VERBOSE:
+            return ''
+        maybe_regex = maybe_regex.pattern
+    if not isinstance(maybe_regex, str) or '|' in maybe_regex:
+        return ''
+    prefix = []
+    for c in maybe_regex:
+        if c in _REGEX_SPECIAL_CHARS or not c.isascii():
+            # These quantifiers make the preceding character optional
+            if c in '*?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(c)
+    return ''.join(prefix).lower()
+
+
+class ResourceIndex(object):
+    """
+    Finds the first resource, out of a list of (pattern, options) pairs as
+    returned by :py:func:`parse_resources`, which matches a request path.
+
+    The result is identical to trying each pattern with :py:func:`try_match`
+    in order, but literal patterns are looked up in a dict, and regular
+    expressions are indexed in a prefix trie on their literal prefix (e.g.
+    `/api/v2/` for `/api/v2/.*`), so only the patterns which can possibly
+    match a path are tried, still in their original order.
+
+    If `route_cache` is True, :py:meth:`match_route` also remembers the
+    resource which was found for each static Sanic route.
+    """
+    __slots__ = ('resources', 'literals', 'trie', 'unindexed', 'regexes',
+                 'routes')
+
+    def __init__(self, resources, route_cache=False):
+        self.resources = tuple(resources)
+        self.routes = {} if route_cache else None
+        self.literals = {}
+        self.trie = {}
+        self.unindexed = []
+        regexes = []
+        for i, (pattern, _) in enumerate(self.resources):
+            if not isinstance(pattern, RegexObject) and not probably_regex(pattern):
+                self.literals.setdefault(pattern.lower(), i)
+                regexes.append(None)
+                continue
+            if isinstance(pattern, RegexObject):
+                regexes.append(pattern)
+            else:
+                regexes.append(re.compile(pattern, flags=re.IGNORECASE))
+            prefix = get_literal_prefix(pattern)
+            if not prefix:
+                self.unindexed.append(i)
+                continue
+            node = self.trie
+            for c in prefix:
+                node = node.setdefault(c, {})
+            # The empty string is never a character, so cannot clash
+            node.setdefault('', []).append(i)
+        self.regexes = tuple(regexes)
+
+    def __len__(self):
+        return len(self.resources)
+
+    def __iter__(self):
+        return iter(self.resources)
+
+    def match(self, path):
+        """
+        Returns the first (pattern, options) resource which matches the
+        given path, or None if there is no match.
+        """
+        if not path.isascii():
+            # Case-insensitive matching of non-ascii text may not agree
+            # with str.lower(), so try every pattern.
+            return self._match_all(path)
+        lowered = path.lower()
+        candidates = list(self.unindexed)
+        literal = self.literals.get(lowered)
+        if literal is not None:
+            candidates.append(literal)
+        node = self.trie
+        for c in lowered:
+            node = node.get(c)
+            if node is None:
+                break
+            candidates.extend(node.get('', ()))
+        if len(candidates) > 1:
+            candidates.sort()
+        regexes = self.regexes
+        for i in candidates:
+            regex = regexes[i]
+            if regex is None or regex.match(path):
+                return self.resources[i]
+        return None
+
+    def match_route(self, route, path):
+        """
+        Same as :py:meth:`match`, but when the route cache is enabled the
+        resource found for a static route is remembered, keyed on the route's
+        name, so later requests to that route need no pattern matching.
+
+        Dynamic routes are always matched on their path, as different paths
+        to them can match different resources. So are requests whose path is
+        not the route's own path (e.g. with a trailing slash, when slashes are
+        not strict), and routes which share their name with another route.
+        """
+        routes = self.routes
+        if routes is None or route is None or not route.static:
+            return self.match(path)
+        cached = routes.get(route.name)
+        if cached is not None and cached[0] == path:
+            return cached[1]
+        resource = self.match(path)
+        if cached is None and path == '/' + route.path:
+            routes[route.name] = (path, resource)
+        return resource
+
+    def _match_all(self, path):
+        for resource in self.resources:
+            if try_match(path, resource[0]):
+                return resource
+        return None
+
+
 def get_regexp_pattern(regexp):
     """
     Helper that returns regexp pattern from given value.
@@ -116,8 +266,7 @@ def get_regexp_pattern(regexp):
 
 
 def get_cors_origins(options, request_origin):
-    origins = options.get('origins')
-    wildcard = r'.*' in origins
+    policy = get_policy(options)
 
     # If the Origin header is not present terminate this set of steps.
     # The request is outside the scope of this specification.-- W3Spec
@@ -125,32 +274,21 @@ def get_cors_origins(options, request_origin):
         LOG.debug("CORS request received with 'Origin' %s", request_origin)
 
         # If the allowed origins is an asterisk or 'wildcard', always match
-        if wildcard and options.get('send_wildcard'):
+        if policy.origins_wildcard and policy.send_wildcard:
             LOG.debug("Allowed origins are set to '*'. Sending wildcard CORS header.")
             return ['*']
-        # If the value of the Origin header is a case-sensitive match
-        # for any of the values in list of origins
-        elif try_match_any(request_origin, origins):
-            LOG.debug("The request's Origin header matches. Sending CORS headers.", )
-            # Add a single Access-Control-Allow-Origin header, with either
-            # the value of the Origin header or the string "*" as value.
-            # -- W3Spec
-            return [request_origin]
-        else:
-            LOG.debug("The request's Origin header does not match any of allowed origins.")
-            return None
 
-    elif options.get('always_send'):
-        if wildcard:
-            # If wildcard is in the origins, even if 'send_wildcard' is False,
-            # simply send the wildcard. It is the most-likely to be correct
-            # thing to do (the only other option is to return nothing, which)
-            # pretty is probably not whawt you want if you specify origins as
-            # '*'
-            return ['*']
-        else:
-            # Return all origins that are not regexes.
-            return sorted([o for o in origins if not probably_regex(o)])
+        cache = policy.origin_cache
+        if cache is None:
+            return match_cors_origin(policy, request_origin)
+        origins_to_set = cache.get(request_origin, _MISSING)
+        if origins_to_set is _MISSING:
+            origins_to_set = match_cors_origin(policy, request_origin)
+            cache.put(request_origin, origins_to_set)
+        return origins_to_set
+
+    elif policy.always_send:
+        return list(policy.always_send_origins)
 
     # Terminate these steps, return the original request untouched.
     else:
@@ -159,30 +297,115 @@ def get_cors_origins(options, request_origin):
         return None
 
 
+def match_cors_origin(policy, request_origin):
+    """
+    Decides which Access-Control-Allow-Origin values to send for a request
+    with the given Origin header, without consulting the policy's cache.
+    """
+    # If the value of the Origin header is a case-sensitive match
+    # for any of the values in list of origins
+    matched = policy.match_origin(request_origin)
+    if matched:
+        LOG.debug("The request's Origin header matches %r. Sending CORS headers.", matched)
+        # Add a single Access-Control-Allow-Origin header, with either
+        # the value of the Origin header or the string "*" as value.
+        # -- W3Spec
+        return [request_origin]
+    else:
+        LOG.debug("The request's Origin header does not match any of allowed origins.")
+        return None
+
+
 def get_allow_headers(options, acl_request_headers):
     if acl_request_headers:
-        request_headers = [h.strip() for h in acl_request_headers.split(',')]
+        policy = get_policy(options)
+        cache = policy.allow_headers_cache
+        if cache is None:
+            return match_allow_headers(policy, acl_request_headers)
+        allowed = cache.get(acl_request_headers)
+        if allowed is None:
+            allowed = match_allow_headers(policy, acl_request_headers)
+            cache.put(acl_request_headers, allowed)
+        return allowed
 
-        # any header that matches in the allow_headers
-        matching_headers = filter(
-            lambda h: try_match_any(h, options.get('allow_headers')),
-            request_headers
-        )
+    return None
 
-        return ', '.join(sorted(matching_headers))
 
-    return None
+def match_allow_headers(policy, acl_request_headers):
+    """
+    Returns which of the headers requested by a preflight are allowed, as the
+    value of the Access-Control-Allow-Headers header, without consulting
+    the policy's cache.
+    """
+    request_headers = [h.strip() for h in acl_request_headers.split(',')]
+
+    if policy.allow_headers_wildcard:
+        # Every header is allowed, so there is nothing to match
+        return ', '.join(sorted(request_headers))
+
+    # any header that matches in the allow_headers
+    matching_headers = filter(policy.match_allow_header, request_headers)
+
+    return ', '.join(sorted(matching_headers))
 
 
 def get_cors_headers(options: Dict, request_headers: CIMultiDict, request_method):
-    found_origins_list = request_headers.getall('Origin', None)
-    found_origins = ", ".join(found_origins_list) if found_origins_list else None
-    origins_to_set = get_cors_origins(options, found_origins)
+    return CIMultiDict(get_cors_header_items(options, request_headers, request_method))
+
+
+def get_cors_header_items(options, request_headers, request_method):
+    """
+    Returns the CORS headers to set in response to a request, as a tuple of
+    (name, value) pairs.
+
+    The headers only depend on the policy, the request's Origin, whether the
+    request is a preflight, and the preflight's requested method and headers,
+    so the rendered headers are cached on the policy using these as the key.
+    """
+    policy = get_policy(options)
+    if 'Origin' in request_headers:
+        found_origins_list = request_headers.getall('Origin')
+        found_origins = ", ".join(found_origins_list) if found_origins_list else None
+    elif not policy.always_send:
+        # Not a CORS request, and nothing is sent without an Origin
+        return ()
+    elif request_method != 'OPTIONS':
+        return policy.no_origin_headers
+    else:
+        found_origins = None
+
+    # This is a preflight request
+    # http://www.w3.org/TR/cors/#resource-preflight-requests
+    if request_method == 'OPTIONS':
+        acl_request_method = request_headers.get(ACL_REQUEST_METHOD, '').upper()
+        acl_request_headers_list = request_headers.getall(ACL_REQUEST_HEADERS, None)
+        acl_request_headers = ", ".join(acl_request_headers_list) if acl_request_headers_list else None
+        key = (found_origins, True, acl_request_method, acl_request_headers)
+    else:
+        key = (found_origins, False, None, None)
+
+    cache = policy.header_cache
+    if cache is None:
+        return render_cors_headers(policy, *key)
+    headers = cache.get(key, _MISSING)
+    if headers is _MISSING:
+        headers = render_cors_headers(policy, *key)
+        cache.put(key, headers)
+    return headers
+
+
+def render_cors_headers(policy, request_origin, preflight,
+                        acl_request_method=None, acl_request_headers=None):
+    """
+    Computes the CORS headers for a request, without consulting the
+    policy's cache of rendered headers.
+    """
+    origins_to_set = get_cors_origins(policy, request_origin)
 
     if not origins_to_set:  # CORS is not enabled for this route
-        return CIMultiDict()
+        return ()
 
-    # This is a regular dict here, it gets converted to a CIMultiDict at the bottom of this function.
+    # This is a regular dict here, it gets converted to a tuple at the bottom of this function.
     headers = {}
 
     for origin in origins_to_set:
@@ -190,48 +413,42 @@ def get_cors_headers(options: Dict, request_headers: CIMultiDict, request_method
         # With CIMultiDict it should work with multiple
         headers[ACL_ORIGIN] = origin
 
-    headers[ACL_EXPOSE_HEADERS] = options.get('expose_headers')
+    headers[ACL_EXPOSE_HEADERS] = policy.expose_headers
 
-    if options.get('supports_credentials'):
+    if policy.supports_credentials:
         headers[ACL_CREDENTIALS] = 'true'  # case sensative
 
     # This is a preflight request
     # http://www.w3.org/TR/cors/#resource-preflight-requests
-    if request_method == 'OPTIONS':
-        acl_request_method = request_headers.get(ACL_REQUEST_METHOD, '').upper()
-
+    if preflight:
         # If there is no Access-Control-Request-Method header or if parsing
         # failed, do not set any additional headers
-        if acl_request_method and acl_request_method in options.get('methods'):
+        if acl_request_method and acl_request_method in policy.methods:
 
             # If method is not a case-sensitive match for any of the values in
             # list of methods do not set any additional headers and terminate
             # this set of steps.
-            acl_request_headers_list = request_headers.getall(ACL_REQUEST_HEADERS, None)
-            acl_request_headers = ", ".join(acl_request_headers_list) if acl_request_headers_list else None
-            headers[ACL_ALLOW_HEADERS] = get_allow_headers(options, acl_request_headers)
-            headers[ACL_MAX_AGE] = str(options.get('max_age'))  # sanic cannot handle integers in header values.
-            headers[ACL_METHODS] = options.get('methods')
+            headers[ACL_ALLOW_HEADERS] = get_allow_headers(policy, acl_request_headers)
+            headers[ACL_MAX_AGE] = policy.max_age
+            headers[ACL_METHODS] = policy.methods_header
         else:
             LOG.info("The request's Access-Control-Request-Method header does not match allowed methods. "
                      "CORS headers will not be applied.")
 
     # http://www.w3.org/TR/cors/#resource-implementation
-    if options.get('vary_header'):
+    if policy.vary_header:
         # Only set header if the origin returned will vary dynamically,
         # i.e. if we are not returning an asterisk, and there are multiple
         # origins that can be matched.
         if headers[ACL_ORIGIN] == '*':
             pass
-        elif (len(options.get('origins')) > 1 or
-              len(origins_to_set) > 1 or
-              any(map(probably_regex, options.get('origins')))):
+        elif policy.origins_vary or len(origins_to_set) > 1:
             headers['Vary'] = "Origin"
 
-    return CIMultiDict((k, v) for k, v in headers.items() if v)
+    return tuple((k, v) for k, v in headers.items() if v)
 
 
-def set_cors_headers(req, resp, req_context, options):
+def set_cors_headers(req, resp, req_context, options, metrics=None):
     """
     Performs the actual evaluation of Sanic-CORS options and actually
     modifies the response object.
@@ -239,14 +456,15 @@ def set_cors_headers(req, resp, req_context, options):
     This function is used in the decorator, the CORS exception wrapper,
     and the after_request callback
     :param sanic.request.Request req:
+    :param CorsMetrics metrics: if given, the outcome and the time spent
+        working out the headers are recorded in it
 
     """
     # If CORS has already been evaluated via the decorator, skip
-    if req_context is not None:
-        evaluated = getattr(req_context, SANIC_CORS_EVALUATED, False)
-        if evaluated:
-            LOG.debug('CORS have been already evaluated, skipping')
-            return resp
+    state = get_request_state(req_context)
+    if state is not None and state.evaluated:
+        LOG.debug('CORS have been already evaluated, skipping')
+        return resp
 
     # `resp` can be None or [] in the case of using Websockets
     # however this case should have been handled in the `extension` and `decorator` methods
@@ -254,28 +472,126 @@ def set_cors_headers(req, resp, req_context, options):
     if not resp:
         return None
 
-    if resp.headers is None:
-        resp.headers = CIMultiDict()
+    if metrics is not None:
+        start = perf_counter()
+    policy = get_policy(options)
+    if state is not None and state.policy is policy:
+        # Already decided for this request, e.g. for a response which was
+        # replaced by an error response
+        headers_to_set = state.headers
+    else:
+        headers_to_set = get_cors_header_items(policy, req.headers, req.method)
+        if state is not None:
+            state.policy = policy
+            state.headers = headers_to_set
+    if headers_to_set:
+        if resp.headers is None:
+            resp.headers = CIMultiDict()
+
+        LOG.debug('Settings CORS headers: %s', headers_to_set)
+        apply_cors_headers(resp.headers, headers_to_set)
+    if metrics is not None:
+        metrics.record_headers(req, headers_to_set, perf_counter() - start)
+    return resp
 
-    headers_to_set = get_cors_headers(options, req.headers, req.method)
-    LOG.debug('Settings CORS headers: %s', str(headers_to_set))
 
-    for k, v in headers_to_set.items():
-        # Special case for "Vary" header, we should append it to a comma separated list
-        if (k == "vary" or k == "Vary") and "vary" in resp.headers:
-            vary_list = resp.headers.popall("vary")
-            vary_list.append(v)
-            new_vary = ", ".join(vary_list)
-            try:
-                resp.headers.add('Vary', new_vary)
-            except Exception:
-                resp.headers['Vary'] = new_vary
-        else:
-            try:
-                resp.headers.add(k, v)
-            except Exception:
-                resp.headers[k] = v
-    return resp
+class CorsRequestState(object):
+    """
+    What Sanic-CORS has worked out for a single request. It is stored on the
+    request's context, so that the request middleware, the response
+    middleware, the exception handler and the decorator share it, and each
+    request's resource is matched, and its CORS headers decided, only once.
+    """
+    __slots__ = ('context', 'resource', 'resource_matched',
+                 'preflight_resource', 'preflight_matched', 'policy',
+                 'headers', 'evaluated', 'error_handled')
+
+    def __init__(self):
+        # The resources matched for the request, and whether they have been
+        # matched yet. Only resources with automatic_options can answer a
+        # preflight, so its resource is matched separately. They belong to
+        # the resources of one CORS extension, e.g. an app's or a blueprint's,
+        # given by context.
+        self.context = None
+        self.resource = None
+        self.resource_matched = False
+        self.preflight_resource = None
+        self.preflight_matched = False
+        # The policy the headers were last decided with, and the headers
+        self.policy = None
+        self.headers = None
+        # Whether CORS headers have been applied to the response
+        self.evaluated = False
+        # Whether the exception handler applied CORS to an error response, so
+        # the response middleware has nothing to do
+        self.error_handled = False
+
+
+def get_request_state(req_context):
+    """
+    Returns the :py:class:`CorsRequestState` stored on a request's context,
+    creating it the first time, or None if there is no request context.
+    """
+    if req_context is None:
+        return None
+    state = getattr(req_context, SANIC_CORS_STATE, None)
+    if state is None:
+        state = CorsRequestState()
+        setattr(req_context, SANIC_CORS_STATE, state)
+    return state
+
+
+def apply_cors_headers(headers, headers_to_set):
+    """
+    Writes (name, value) pairs of CORS headers onto a response's headers, in
+    a single pass. How headers are written is chosen once, from the type of
+    the container: they are added to a multidict, and set on anything else.
+
+    The Vary header is merged with any Vary tokens already on the response,
+    rather than added alongside them.
+    """
+    if isinstance(headers, CIMultiDict):
+        set_header = headers.add
+        get_vary = headers.getall
+    else:
+        set_header = headers.__setitem__
+
+        def get_vary(key, default):
+            value = headers.get(key)
+            return [value] if value else default
+
+    for k, v in headers_to_set:
+        if k == 'Vary':
+            existing = get_vary('Vary', None)
+            if existing:
+                # Replaces every existing Vary header with the merged one
+                headers['Vary'] = merge_vary(existing, v)
+                continue
+        set_header(k, v)
+
+
+def merge_vary(values, token):
+    """
+    Returns the value of a Vary header which combines the given Vary header
+    values with the given token.
+
+    Header names are case-insensitive, so the token is only added if no
+    existing token matches it case-insensitively, and repeated tokens are
+    dropped. The existing tokens keep their order and spelling. Nothing is
+    added to `Vary: *`, which already varies on everything.
+    """
+    tokens = []
+    seen = set()
+    for value in values:
+        for t in value.split(','):
+            t = t.strip()
+            lowered = t.lower()
+            if t and lowered not in seen:
+                seen.add(lowered)
+                tokens.append(t)
+    if '*' not in seen and token.lower() not in seen:
+        tokens.append(token)
+    return ', '.join(tokens)
 
 
 def probably_regex(maybe_regex):
@@ -404,4 +720,398 @@ def serialize_options(opts):
     if isinstance(options.get('max_age'), timedelta):
         options['max_age'] = str(int(options['max_age'].total_seconds()))
 
-    return options
+    return CorsPolicy(options)
+
+
+def get_policy(options):
+    """
+    Returns the :py:class:`CorsPolicy` for the given options, compiling them
+    first if a plain options dictionary was given.
+    """
+    if isinstance(options, CorsPolicy):
+        return options
+    return serialize_options(options)
+
+
+class CorsPolicy(collections.abc.Mapping):
+    """
+    The compiled form of a set of CORS options, as returned by
+    :py:func:`serialize_options`.
+
+    Everything which depends only on the configuration (wildcard and regex
+    detection, compiled regular expressions, the sets of allowed methods and
+    the rendered header values) is worked out once, when the policy is
+    built, so that none of it needs to be recomputed per request.
+
+    A policy is immutable. For backwards compatibility it is also a
+    read-only mapping of the serialized options it was built from.
+    """
+    __slots__ = ('_options', 'origins', 'origins_wildcard', 'origins_regex',
+                 'origins_vary', 'literal_origins', 'origin_regexes',
+                 'allow_header_patterns', 'methods', 'methods_header',
+                 'expose_headers', 'max_age', 'supports_credentials',
+                 'send_wildcard', 'always_send', 'vary_header',
+                 'automatic_options', 'intercept_exceptions', 'origin_cache',
+                 'header_cache', 'allow_headers_cache', 'allow_headers_wildcard',
+                 'always_send_origins', 'no_origin_headers')
+
+    def __init__(self, options):
+        _set = super(CorsPolicy, self).__setattr__
+        _set('_options', options)
+
+        origins = tuple(o for o in options.get('origins') or () if o is not None)
+        origins_regex = any(probably_regex(o) for o in origins)
+        _set('origins', origins)
+        _set('origins_wildcard', r'.*' in origins)
+        _set('origins_regex', origins_regex)
+        _set('origins_vary', len(origins) > 1 or origins_regex)
+        # Literal origins are matched case insensitively with a single set
+        # lookup, so only the regular expressions need to be tried in turn.
+        _set('literal_origins', frozenset(
+            o.lower() if isinstance(o, str) else o
+            for o in origins if not probably_regex(o)))
+        _set('origin_regexes', RegexSet(o for o in origins if probably_regex(o)))
+        allow_headers = options.get('allow_headers') or ()
+        _set('allow_header_patterns', compile_patterns(allow_headers))
+        _set('allow_headers_wildcard', r'.*' in allow_headers)
+
+        methods_header = options.get('methods')
+        _set('methods_header', methods_header)
+        _set('methods', frozenset(m.strip() for m in methods_header.split(','))
+             if methods_header else frozenset())
+        _set('expose_headers', options.get('expose_headers'))
+        max_age = options.get('max_age')
+        _set('max_age', str(max_age) if max_age is not None else None)
+
+        _set('supports_credentials', bool(options.get('supports_credentials')))
+        _set('send_wildcard', bool(options.get('send_wildcard')))
+        _set('always_send', bool(options.get('always_send')))
+        _set('vary_header', bool(options.get('vary_header')))
+        _set('automatic_options', options.get('automatic_options', True))
+        _set('intercept_exceptions', options.get('intercept_exceptions', True))
+
+        # Request origins are few and repetitive, so the decision for each one
+        # and the headers rendered for each kind of request are kept in
+        # bounded caches. The bound stops clients from growing them without
+        # limit by sending arbitrary Origin headers.
+        cache_size = options.get('cache_size')
+        _set('origin_cache', LRUCache(cache_size) if cache_size else None)
+        _set('header_cache', LRUCache(cache_size) if cache_size else None)
+        _set('allow_headers_cache', LRUCache(cache_size) if cache_size else None)
+
+        # With always_send, requests without an Origin get the same headers
+        # every time, so they are rendered once, here.
+        if self.origins_wildcard:
+            # If wildcard is in the origins, even if 'send_wildcard' is False,
+            # simply send the wildcard. It is the most-likely to be correct
+            # thing to do (the only other option is to return nothing, which)
+            # pretty is probably not whawt you want if you specify origins as
+            # '*'
+            _set('always_send_origins', ('*',))
+        else:
+            # All origins that are not regexes.
+            _set('always_send_origins',
+                 tuple(sorted(o for o in origins if not probably_regex(o))))
+        _set('no_origin_headers',
+             render_cors_headers(self, None, False) if self.always_send else ())
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CorsPolicy is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("CorsPolicy is immutable")
+
+    def __getitem__(self, key):
+        return self._options[key]
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __repr__(self):
+        return "CorsPolicy({!r})".format(self._options)
+
+    def copy(self):
+        """Returns the serialized options as a new, mutable dictionary."""
+        return dict(self._options)
+
+    def clear_caches(self):
+        """Empties the caches of decisions made with this policy."""
+        for cache in (self.origin_cache, self.header_cache,
+                      self.allow_headers_cache):
+            if cache is not None:
+                cache.clear()
+
+    def match_origin(self, request_origin):
+        """
+        Returns the configured origin (lowercased, if it is a literal) or
+        regular expression which matches the given request origin, or None.
+        """
+        lowered = request_origin.lower()
+        if lowered in self.literal_origins:
+            return lowered
+        return self.origin_regexes.match(request_origin)
+
+    def match_allow_header(self, header):
+        return try_match_any(header, self.allow_header_patterns)
+
+
+class LRUCache(object):
+    """
+    A bounded mapping which evicts its least recently used entry when full,
+    and counts its hits and misses.
+
+    It is not thread safe. It needs no locking when used from a single event
+    loop (i.e. one per worker), as nothing is awaited while it is updated.
+    """
+    __slots__ = ('maxsize', 'hits', 'misses', '_data')
+
+    def __init__(self, maxsize):
+        self.maxsize = int(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > self.maxsize:
+            data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    maxsize=self.maxsize, currsize=len(self._data))
+
+
+class Histogram(object):
+    """
+    Counts observed values into buckets with the given upper bounds, in the
+    style of a Prometheus histogram, along with their count and sum.
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(sorted(bounds))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def clear(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def snapshot(self):
+        """
+        Returns the cumulative count of values less than or equal to each
+        upper bound (the last one being infinity), and the count and sum.
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return dict(buckets=buckets, count=self.count, sum=self.sum)
+
+
+# Upper bounds, in seconds, of the buckets of CORS header timings
+TIMING_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+
+
+class CorsMetrics(object):
+    """
+    Counters and timings of the CORS work done for requests, kept when the
+    `metrics` option is enabled.
+
+    They are kept per worker, and only updated synchronously, so need no
+    locking. :py:meth:`snapshot` returns them as plain data, for exporters
+    (e.g. to Prometheus) to read.
+    """
+    __slots__ = ('resources', 'matches', 'unmatched', 'skipped', 'requests',
+                 'origins', 'timing')
+
+    def __init__(self, resources):
+        self.resources = tuple(resources)
+        self.timing = Histogram(TIMING_BUCKETS)
+        self.clear()
+
+    def clear(self):
+        # Requests which matched each resource, by pattern
+        self.matches = collections.Counter()
+        # Requests which matched no resource
+        self.unmatched = 0
+        # Requests without an Origin which were passed over without matching
+        self.skipped = 0
+        self.requests = dict(simple=0, preflight=0)
+        self.origins = dict(allowed=0, denied=0, absent=0)
+        self.timing.clear()
+
+    def record_match(self, resource):
+        if resource is None:
+            self.unmatched += 1
+        else:
+            self.matches[get_regexp_pattern(resource[0])] += 1
+
+    def record_headers(self, req, headers_to_set, elapsed):
+        """
+        Records the CORS headers worked out for a request, and the time taken.
+        """
+        self.requests['preflight' if req.method == 'OPTIONS' else 'simple'] += 1
+        if 'Origin' not in req.headers:
+            self.origins['absent'] += 1
+        elif headers_to_set:
+            self.origins['allowed'] += 1
+        else:
+            self.origins['denied'] += 1
+        self.timing.observe(elapsed)
+
+    def snapshot(self):
+        """
+        Returns the metrics as a dictionary of plain values, including the
+        statistics of each resource's caches.
+        """
+        caches = {}
+        for pattern, policy in self.resources:
+            caches[get_regexp_pattern(pattern)] = dict(
+                (name, cache.info()) for name, cache in (
+                    ('origin', policy.origin_cache),
+                    ('headers', policy.header_cache),
+                    ('allow_headers', policy.allow_headers_cache))
+                if cache is not None)
+        return dict(matches=dict(self.matches),
+                    unmatched=self.unmatched,
+                    skipped=self.skipped,
+                    requests=dict(self.requests),
+                    origins=dict(self.origins),
+                    set_cors_headers_seconds=self.timing.snapshot(),
+                    caches=caches)
+
+
+# Flags which can be applied to a single group of a combined regex
+_SCOPED_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'))
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+# A flag group which applies to the whole pattern, e.g. `(?i)`. Before
+# Python 3.11 it only warns when it is not at the start, and then applies to
+# the whole of a combined regex.
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+
+def _scoped_pattern(maybe_regex):
+    """
+    Returns the pattern of the given regex wrapped in a group carrying its
+    own flags, or None if it cannot safely be embedded in another regex.
+    """
+    if isinstance(maybe_regex, RegexObject):
+        pattern, flags = maybe_regex.pattern, maybe_regex.flags
+        if maybe_regex.groupindex:
+            return None
+    else:
+        pattern, flags = maybe_regex, re.IGNORECASE | re.UNICODE
+    if (not isinstance(pattern, str) or _BACKREFERENCE.search(pattern) or
+            _GLOBAL_FLAGS.search(pattern)):
+        return None
+    if flags & ~(re.UNICODE | re.IGNORECASE | re.MULTILINE | re.DOTALL):
+        return None
+    scoped = '(?{}:{})'.format(
+        ''.join(c for flag, c in _SCOPED_FLAGS if flags & flag), pattern)
+    try:
+        if re.compile(scoped).groupindex:
+            return None
+    except re.error:
+        return None
+    return scoped
+
+
+class RegexSet(object):
+    """
+    Matches a string against a number of regular expressions at once. The
+    patterns are combined into a single alternation, with a named group per
+    pattern, so that a miss costs a single scan. Patterns which cannot be
+    combined safely (for instance those with back-references or named groups)
+    are tried one by one afterwards.
+
+    Strings are matched case insensitively and compiled regexes use their own
+    flags, exactly as :py:func:`try_match` would.
+    """
+    __slots__ = ('patterns', 'combined', 'groups', 'separate')
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self.groups = {}
+        self.combined = None
+        alternatives = []
+        separate = []
+        for pattern in self.patterns:
+            scoped = _scoped_pattern(pattern)
+            if scoped is None:
+                separate.append(pattern)
+                continue
+            name = '_sanic_cors_{:d}'.format(len(alternatives))
+            alternatives.append('(?P<{}>{})'.format(name, scoped))
+            self.groups[name] = pattern
+        if alternatives:
+            try:
+                self.combined = re.compile('|'.join(alternatives))
+            except re.error:
+                self.combined = None
+                self.groups = {}
+                separate = list(self.patterns)
+        self.separate = tuple(zip(compile_patterns(separate), separate))
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def match(self, inst):
+        """
+        Returns the configured pattern which matches the start of the given
+        string, or None if none of them do.
+        """
+        if self.combined is not None:
+            match = self.combined.match(inst)
+            if match:
+                return self.groups[match.lastgroup]
+        for regex, pattern in self.separate:
+            if regex.match(inst):
+                return pattern
+        return None
+
+
+def compile_patterns(patterns):
+    """
+    Compiles the strings in the given list of origins or headers which look
+    like regular expressions, in the same way :py:func:`try_match` would.
+    Literal strings and already compiled regular expressions are kept as is.
+    """
+    return tuple(
+        re.compile(p, flags=re.IGNORECASE)
+        if isinstance(p, str) and probably_regex(p) else p
+        for p in patterns if p is not None
+    )
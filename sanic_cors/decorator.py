@@ -13,7 +13,71 @@ from functools import wraps
 
 from sanic.log import logger
 from .core import *
-from .extension import CORS
+from .extension import _check_sanic_version, cors_route_wrapper
+
+# Attribute added to the app (or blueprint) context, holding the
+# CrossOriginCompiler shared by every view on it wrapped with cross_origin.
+SANIC_CORS_COMPILER = '_sanic_cors_compiler'
+
+
+class CrossOriginCompiler(object):
+    """
+    Compiles the CORS options of the views on one app (or blueprint) which
+    are wrapped with :py:func:`cross_origin`, and remembers those views, so
+    that their options can be rebuilt if the app configuration changes.
+
+    The app's `CORS_*` configuration is read when each view is decorated, so
+    a view picks up any change made to it before then.
+    """
+    __slots__ = ('app', 'views')
+
+    def __init__(self, app):
+        self.app = app
+        self.views = []
+
+    def compile(self, decorator_kwargs):
+        options = DEFAULT_OPTIONS.copy()
+        options.update(get_app_kwarg_dict(self.app))
+        options.update(decorator_kwargs)
+        return serialize_options(options)
+
+    def add_view(self, view, decorator_kwargs):
+        view.cors_options = self.compile(decorator_kwargs)
+        self.views.append((view, decorator_kwargs))
+
+    def invalidate(self):
+        """Recompiles the options of every view, from the current config."""
+        for view, decorator_kwargs in self.views:
+            view.cors_options.clear_caches()
+            view.cors_options = self.compile(decorator_kwargs)
+
+
+def get_cross_origin_compiler(app):
+    """
+    Returns the :py:class:`CrossOriginCompiler` of the given app (or
+    blueprint), creating it the first time.
+    """
+    try:
+        return getattr(app.ctx, SANIC_CORS_COMPILER)
+    except AttributeError:
+        _check_sanic_version()
+        compiler = CrossOriginCompiler(app)
+        setattr(app.ctx, SANIC_CORS_COMPILER, compiler)
+        return compiler
+
+
+def invalidate_cross_origin(app):
+    """
+    Recompiles the CORS options of every view on the given app (or blueprint)
+    which is wrapped with :py:func:`cross_origin`.
+
+    The options of a decorated view are computed when the decorator is
+    applied, so this must be called if the app's `CORS_*` configuration is
+    changed after that point.
+    """
+    compiler = getattr(app.ctx, SANIC_CORS_COMPILER, None)
+    if compiler is not None:
+        compiler.invalidate()
 
 
 def cross_origin(app, *args, **kwargs):
@@ -93,6 +157,15 @@ def cross_origin(app, *args, **kwargs):
         Default : True
     :type vary_header: bool
 
+    :param cache_size:
+        The maximum number of request origins for which the CORS decision,
+        and kinds of request for which the rendered CORS headers, are
+        remembered for each resource. The least recently used entries are
+        evicted first. Set to 0 or None to disable these caches.
+
+        Default : 256
+    :type cache_size: int or None
+
     :param automatic_options:
         Only applies to the `cross_origin` decorator. If True, Sanic-CORS will
         override Sanic's default OPTIONS handling to return CORS headers for
@@ -103,15 +176,30 @@ def cross_origin(app, *args, **kwargs):
 
     """
     decorator_kwargs = kwargs
-    decorator_args = args
-    #_real_decorator = cors.decorate(app, *args, run_middleware=False, with_context=False, **kwargs)
-    cors = CORS(app, no_startup=True)
+    compiler = get_cross_origin_compiler(app)
     def wrapper(f):
         @wraps(f)
         async def inner(request, *args, **kwargs):
-            return await cors.route_wrapper(f, request, app, args, kwargs, *decorator_args, **decorator_kwargs)
+            return await cors_route_wrapper(f, request, inner.cors_options, args, kwargs)
 
-        logger.log(logging.DEBUG, "Enabled {:s} for cross_origin using options: {}".format(str(f), str(decorator_kwargs)))
+        compiler.add_view(inner, decorator_kwargs)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.log(logging.DEBUG, "Enabled {:s} for cross_origin using options: {}".format(str(f), str(decorator_kwargs)))
         return inner
 
     return wrapper
+
+
+def no_cors(f):
+    """
+    This function is the decorator which marks a Sanic view as exempt from
+    CORS, such as a health check or metrics endpoint, which would otherwise
+    be covered by the resources of the CORS extension. It is equivalent to
+    adding the route with `ctx_no_cors=True`.
+
+    Exempt routes are found when the server starts, so requests to them are
+    passed over by the CORS middleware without matching any resources, and
+    get no CORS headers. It must be applied below the route decorator.
+    """
+    f.no_cors = True
+    return f
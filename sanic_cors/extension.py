@@ -9,8 +9,10 @@
     :license: MIT, see LICENSE for more details.
 """
 from asyncio import iscoroutinefunction
+from collections import deque
 from functools import update_wrapper, partial
 from inspect import isawaitable
+from time import perf_counter
 from types import SimpleNamespace
 from typing import Optional, Dict
 
@@ -158,15 +160,73 @@ class CORS(Extension):
 
         Default : True
     :type vary_header: bool
+
+    :param cache_size:
+        The maximum number of request origins for which the CORS decision,
+        and kinds of request for which the rendered CORS headers, are
+        remembered for each resource. The least recently used entries are
+        evicted first. Set to 0 or None to disable these caches.
+
+        Default : 256
+    :type cache_size: int or None
+
+    :param route_cache:
+        If True, the resource which matches each static Sanic route is
+        resolved on the first request to it and remembered, keyed on the
+        route's name, so that later requests to the route skip matching the
+        request path against the resources. Requests to dynamic routes
+        are always matched on their path.
+
+        This only applies to the CORS extension on a blueprint. On an app,
+        the resource of each static route is always resolved at startup,
+        and the option is ignored.
+
+        Default : False
+    :type route_cache: bool
+
+    :param metrics:
+        If True, each worker keeps counts of the resources matched, of
+        preflight and simple requests, and of allowed, denied and absent
+        origins, along with a histogram of the time spent working out the
+        CORS headers. They are available from `app.ctx.sanic_cors.metrics`,
+        whose `snapshot()` method returns them, with the statistics of each
+        resource's caches, as plain data for exporters to read.
+
+        Default : False
+    :type metrics: bool
+
+    :param preflight_routes:
+        If True, preflight requests are answered by OPTIONS routes, which
+        are added at startup to each route covered by a resource with
+        `automatic_options`, instead of by a request middleware which runs
+        on every request. Routes which already accept OPTIONS keep their own
+        handler, and get the preflight headers added to its response. This
+        only applies to the CORS extension on an app, not on a blueprint.
+
+        Default : False
+    :type preflight_routes: bool
+
+    :param signals:
+        If True, the CORS headers are added to responses by a handler of
+        Sanic's `http.lifecycle.response` signal, instead of by a response
+        middleware, and preflights are answered as with `preflight_routes`.
+        The signal is dispatched after a streamed response has started, so
+        streamed responses do not get CORS headers. Requires Sanic 22.9 or
+        later, and only applies to the CORS extension on an app.
+
+        This is not an optimization: on Sanic 22.x, dispatching the signal
+        costs more per request than running the response middleware (see
+        `benchmarks/bench_app.py --variants no-cors cors cors-signals`), so
+        the middleware is the default.
+
+        Default : False
+    :type signals: bool
     """
 
     name: str = "SanicCORS"
 
     def __init__(self, app: Optional[Sanic] = None, config: Optional[Config] = None, *args, **kwargs):
-        if SANIC_21_9_0 > SANIC_VERSION:
-            raise RuntimeError(
-                "You cannot use this version of Sanic-CORS with "
-                "Sanic earlier than v21.9.0")
+        _check_sanic_version()
         self._options = kwargs
         if use_ext:
             if SANIC_EXT_22_6_0 > SANIC_EXT_VERSION:
@@ -189,6 +249,15 @@ class CORS(Extension):
         msg = f"Sanic-CORS: {message}"
         logger.log(level, msg, *args, exc_info=exc_info, **kwargs)
 
+    @staticmethod
+    def debug_enabled():
+        """
+        Whether debug messages would be logged. This is checked once per
+        worker and kept as `context.debug_enabled`, so that the request
+        path can skip building debug messages altogether.
+        """
+        return logger.isEnabledFor(logging.DEBUG)
+
 
     def label(self):
         return "Sanic-CORS"
@@ -207,6 +276,7 @@ class CORS(Extension):
         self.app.ctx.sanic_cors = context = SimpleNamespace()
         context._options = cors_options
         context.log = self.log
+        context.debug_enabled = self.debug_enabled()
         # turn off built-in sanic-ext CORS
         bootstrap.config["CORS"] = False
         self.init_app(context)
@@ -214,15 +284,27 @@ class CORS(Extension):
     def on_before_server_start(self, app, loop=None):
         # use self.app instead of app, because self.app might be a blueprint
         context = self.app.ctx.sanic_cors
-        if not isinstance(self.app, Blueprint) and (SANIC_22_9_0 > SANIC_VERSION):
-            _ = _make_cors_request_middleware_function(self.app, context=context)
-            _ = _make_cors_response_middleware_function(self.app, context=context)
+        # Logging may have been configured differently in this worker
+        context.debug_enabled = self.debug_enabled()
+        if isinstance(self.app, Blueprint):
+            # Routes are only bound by CORS on the app, but the routes exempt
+            # from CORS are needed for preflights to them which fail routing
+            context.exempt_paths = _find_exempt_paths(app)
+            return
+        if SANIC_22_9_0 > SANIC_VERSION:
+            if context.needs_request_middleware:
+                context.request_middleware = _make_cors_request_middleware_function(self.app, context=context)
+            if context.needs_response_middleware:
+                context.response_middleware = _make_cors_response_middleware_function(self.app, context=context)
+        if context.preflight_routes:
+            _add_preflight_routes(self.app, context=context)
+        _bind_cors_routes(self.app, context=context)
+        _prune_cors_middleware(self.app, context=context)
 
     def init_app(self, context, *args, **kwargs):
         app = self.app
         log = context.log
         _options = context._options
-        debug = partial(log, logging.DEBUG)
         # The resources and options may be specified in the App Config, the CORS constructor
         # or the kwargs to the call to init_app.
         options = get_cors_options(app, _options, kwargs)
@@ -240,122 +322,506 @@ class CORS(Extension):
         ]
         context.options = options
         context.resources = resources
-        # Create a human readable form of these resources by converting the compiled
-        # regular expressions into strings.
-        resources_human = dict([(get_regexp_pattern(pattern), opts)
-                                for (pattern, opts) in resources])
-        debug("Configuring CORS with resources: {}".format(resources_human))
+        # Requests without an Origin header only get CORS headers from
+        # resources which always send them
+        context.always_send = any(opts.always_send for _, opts in resources)
+        # Counters and timings of the CORS work done, if enabled. Read them
+        # with context.metrics.snapshot()
+        context.metrics = CorsMetrics(resources) if options.get('metrics') else None
+        # Indexes for finding the first resource which matches a path. Only
+        # resources with automatic_options can answer a preflight request.
+        # Static routes on an app are bound to their resource at startup
+        route_cache = bool(options.get('route_cache'))
+        if route_cache and not isinstance(app, Blueprint):
+            log(logging.INFO, "route_cache only applies to CORS on a blueprint, "
+                              "the routes of an app are resolved at startup.")
+            route_cache = False
+        context.resource_index = ResourceIndex(resources, route_cache)
+        context.preflight_index = ResourceIndex(
+            [r for r in resources if r[1].automatic_options], route_cache)
+        if context.debug_enabled:
+            # Create a human readable form of these resources by converting the compiled
+            # regular expressions into strings.
+            resources_human = dict([(get_regexp_pattern(pattern), opts)
+                                    for (pattern, opts) in resources])
+            log(logging.DEBUG, "Configuring CORS with resources: %s", resources_human)
 
         if isinstance(app, Blueprint):
             # skip error handler override on a blueprint
             # register the middlewares early, on a blueprint
-            _make_cors_request_middleware_function(app, context=context)
-            _make_cors_response_middleware_function(app, context=context)
+            _plan_cors_middleware(context, preflight_routes=False, signals=False)
+            if context.needs_request_middleware:
+                _make_cors_request_middleware_function(app, context=context)
+            if context.needs_response_middleware:
+                _make_cors_response_middleware_function(app, context=context)
+            # Only to check the logging level again once the app has started
+            app.listener("before_server_start")(self.on_before_server_start)
         else:
             if hasattr(app, "error_handler"):
                 cors_error_handler = CORSErrorHandler(context, app.error_handler)
                 setattr(app, "error_handler", cors_error_handler)
-            if SANIC_22_9_0 > SANIC_VERSION:
-                app.listener("before_server_start")(self.on_before_server_start)
-            else:
+            # All routes have been added by before_server_start, so that is
+            # where the CORS resource of each route is bound to it.
+            app.listener("before_server_start")(self.on_before_server_start)
+            # A signal handler cannot respond to a request, so with signals
+            # the preflights are answered by routes
+            signals = _use_signals(options, log)
+            _plan_cors_middleware(context, bool(options.get('preflight_routes') or signals), signals)
+            if signals:
+                _make_cors_response_signal_handler(app, context=context)
+            if SANIC_22_9_0 <= SANIC_VERSION:
                 # Sanic >= v22.9.0 cannot set routes in before_server_start
                 # so run it now (we can assign priorities, so should be fine)
-                _make_cors_request_middleware_function(app, context=context)
-                _make_cors_response_middleware_function(app, context=context)
+                if context.needs_request_middleware:
+                    context.request_middleware = _make_cors_request_middleware_function(app, context=context)
+                if context.needs_response_middleware:
+                    context.response_middleware = _make_cors_response_middleware_function(app, context=context)
 
     async def route_wrapper(self, route, req, app, request_args, request_kw,
                             *decorator_args, **decorator_kw):
         _options = decorator_kw
         options = get_cors_options(app, _options)
-        if options.get('automatic_options', True) and req.method == 'OPTIONS':
-            resp = response.HTTPResponse()
+        return await self.compiled_route_wrapper(route, req, options, request_args, request_kw)
+
+    async def compiled_route_wrapper(self, route, req, options, request_args, request_kw):
+        """
+        Same as :py:meth:`route_wrapper`, but takes CORS options which were
+        already computed with :py:func:`get_cors_options`, so nothing needs
+        to be recomputed on each request.
+        """
+        return await cors_route_wrapper(route, req, options, request_args, request_kw)
+
+
+def _check_sanic_version():
+    if SANIC_21_9_0 > SANIC_VERSION:
+        raise RuntimeError(
+            "You cannot use this version of Sanic-CORS with "
+            "Sanic earlier than v21.9.0")
+
+
+async def cors_route_wrapper(route, req, options, request_args, request_kw):
+    """
+    Calls a view, and applies the given compiled CORS options to its
+    response. It needs no :py:class:`CORS` instance, so views wrapped with
+    :py:func:`cross_origin` do not each construct one.
+    """
+    if options.automatic_options and req.method == 'OPTIONS':
+        resp = response.HTTPResponse()
+    else:
+        resp = route(req, *request_args, **request_kw)
+        while isawaitable(resp):
+            resp = await resp
+        # resp can be `None` or `[]` if using Websockets
+        if not resp:
+            return None
+    try:
+        request_context = req.ctx
+    except (AttributeError, LookupError):
+        request_context = None
+    set_cors_headers(req, resp, request_context, options)
+    if request_context is not None:
+        get_request_state(request_context).evaluated = True
+    else:
+        logging.log(logging.DEBUG, "Cannot access a sanic request "
+                    "context. Has request started? Is request ended?")
+    return resp
+
+
+def _use_signals(options, log):
+    """
+    Returns whether the CORS headers are added by a signal handler rather
+    than by a response middleware.
+    """
+    signals = options.get('signals')
+    if signals and SANIC_22_9_0 > SANIC_VERSION:
+        log(logging.WARNING, "CORS signals require Sanic 22.9 or later, using middleware instead.")
+        return False
+    return bool(signals)
+
+
+def _plan_cors_middleware(context, preflight_routes, signals):
+    """
+    Works out, from the compiled resources, which of the CORS middleware
+    functions can do anything, and logs the decision. The request middleware
+    only answers preflights, for resources with automatic_options, and the
+    response middleware only applies the options of a matching resource.
+    """
+    context.signals = signals
+    context.preflight_routes = preflight_routes
+    context.request_middleware = None
+    context.response_middleware = None
+    context.needs_request_middleware = False
+    context.needs_response_middleware = False
+    if not len(context.resource_index):
+        context.log(logging.INFO, "No CORS resources are configured, so no CORS middleware is installed.")
+    elif not len(context.preflight_index):
+        context.log(logging.INFO, "No CORS resource has automatic_options, so the CORS request middleware is not installed.")
+    elif preflight_routes:
+        context.log(logging.INFO, "CORS preflights are answered by routes, so the CORS request middleware is not installed.")
+    else:
+        context.needs_request_middleware = True
+    if signals:
+        context.log(logging.INFO, "CORS headers are added by a signal handler, so the CORS response middleware is not installed.")
+    elif len(context.resource_index):
+        context.needs_response_middleware = True
+
+
+class _NoMiddleware(deque):
+    """
+    The middleware of a route which has none left. It is always true, so that
+    Sanic does not run the app's middleware for the route instead.
+    """
+    def __bool__(self):
+        return True
+
+
+def _matches_no_path(index, route):
+    return all(index.match(path) is None for path in _route_paths(route))
+
+
+def _prune_cors_middleware(app, context=None):
+    """
+    Removes the CORS middleware from the middleware of each route on which it
+    can do nothing. Sanic runs each route's own copy of the app's middleware,
+    so other routes are unaffected. This only applies on Sanic 22.9 and later.
+
+    The request middleware is removed from routes which do not accept
+    OPTIONS, as preflights to them are routing errors, which run the app's
+    middleware, and from static routes on none of whose paths a resource
+    with automatic_options matches. The response middleware is removed from
+    exempt routes, from static routes on none of whose paths a resource
+    matches, and from views decorated with :py:func:`cross_origin`, which
+    apply CORS themselves.
+
+    Sanic runs the app's middleware for a route whose response middleware is
+    empty, so a route left without any is given a :py:class:`_NoMiddleware`.
+    """
+    request_mw = context.request_middleware
+    response_mw = context.response_middleware
+    if SANIC_22_9_0 > SANIC_VERSION or (request_mw is None and response_mw is None):
+        return
+    pruned_request = pruned_response = 0
+    for route in app.router.routes:
+        binding = getattr(getattr(route, 'ctx', None), 'sanic_cors', None)
+        exempt = binding is not None and binding.exempt
+        static = binding is not None and not exempt
+        if request_mw is not None and (
+                exempt or 'OPTIONS' not in route.methods or
+                (static and _matches_no_path(context.preflight_index, route))):
+            route.extra.request_middleware = deque(
+                m for m in route.extra.request_middleware
+                if getattr(m, 'func', m) is not request_mw)
+            pruned_request += 1
+        if response_mw is not None and (
+                exempt or getattr(route.handler, 'cors_options', None) is not None or
+                (static and _matches_no_path(context.resource_index, route))):
+            middleware = _NoMiddleware(
+                m for m in route.extra.response_middleware
+                if getattr(m, 'func', m) is not response_mw)
+            if len(middleware):
+                middleware = deque(middleware)
+            route.extra.response_middleware = middleware
+            pruned_response += 1
+    if context.debug_enabled:
+        context.log(logging.DEBUG, "Skipping the CORS request middleware on %d routes, "
+                    "and the CORS response middleware on %d routes", pruned_request, pruned_response)
+
+
+def _add_preflight_routes(app, context=None):
+    """
+    Adds an OPTIONS route, which answers CORS preflight requests, alongside
+    each route on the app which a resource with automatic_options covers and
+    which does not accept OPTIONS itself. Preflights are then dispatched to
+    them by the router, rather than intercepted by a request middleware.
+
+    Static routes only get an OPTIONS route if their path matches such a
+    resource. Dynamic routes always get one, as different paths to them can
+    match different resources, and answer as Sanic would without CORS when
+    none matches.
+
+    The router may already be finalized, in which case it is reset, and the
+    app finalized again once the routes are added.
+    """
+    router = app.router
+    if not len(context.preflight_index):
+        return
+    # Several routes can share a path and host, with different methods
+    targets = {}
+    for route in router.routes:
+        key = (route.path, route.requirements.get('host'))
+        if 'OPTIONS' in route.methods:
+            targets[key] = None
+        elif key not in targets and not _is_cors_exempt(route):
+            if route.static and context.preflight_index.match('/' + route.path) is None:
+                continue
+            targets[key] = route
+    targets = [route for route in targets.values() if route is not None]
+    if targets:
+        finalized = getattr(router, 'finalized', False)
+        if finalized:
+            router.reset()
+        for route in targets:
+            app.add_route(_make_preflight_handler(context, route.methods),
+                          '/' + route.path, methods=['OPTIONS'],
+                          host=route.requirements.get('host'),
+                          strict_slashes=route.strict,
+                          name='{}_cors_preflight'.format(route.name))
+        if finalized:
+            app.finalize()
+    if context.debug_enabled:
+        context.log(logging.DEBUG, "Added CORS preflight routes to %d routes", len(targets))
+
+
+def _make_preflight_handler(context, methods):
+    async def cors_preflight(request, *args, **kwargs):
+        resp = _make_preflight_response(context, request)
+        if resp is None:
+            raise MethodNotSupported(
+                "Method OPTIONS not allowed for URL {}".format(request.path),
+                method='OPTIONS', allowed_methods=methods)
+        return resp
+    return cors_preflight
+
+
+def _is_cors_exempt(route):
+    return bool(getattr(route.ctx, 'no_cors', False) or
+                getattr(route.handler, 'no_cors', False))
+
+
+def _route_paths(route):
+    """
+    Returns the paths which requests to a route can have: its own path, and
+    also that path with or without a trailing slash unless it is strict.
+    """
+    path = '/' + route.path
+    if route.strict:
+        return (path,)
+    return (path, path.rstrip('/') if path.endswith('/') else path + '/')
+
+
+def _is_exempt_path(context, req, path):
+    """
+    Whether a request which has no route is to the path of a route exempt
+    from CORS. Requests with a route are checked on its binding instead.
+    """
+    exempt_paths = getattr(context, 'exempt_paths', None)
+    if not exempt_paths or getattr(req, 'route', None) is not None:
+        return False
+    return ((path, None) in exempt_paths or
+            (path, req.headers.get('host')) in exempt_paths)
+
+
+def _find_exempt_paths(app):
+    """
+    Returns the (path, host) of every path which a route on the app exempt
+    from CORS can serve.
+    """
+    exempt_paths = set()
+    for route in app.router.routes:
+        if getattr(route, "ctx", None) is not None and _is_cors_exempt(route):
+            host = route.requirements.get('host')
+            for path in _route_paths(route):
+                exempt_paths.add((path, host))
+    return exempt_paths
+
+
+def _bind_cors_routes(app, context=None):
+    """
+    Resolves the CORS resource of each static route on the app, and stores it
+    on the route's context as `route.ctx.sanic_cors`, so that requests to the
+    route need no path matching. It also shows which CORS options apply to
+    each route.
+
+    Dynamic routes are not bound, as different paths to them can match
+    different resources, unless they are exempt from CORS. A route is exempt
+    if its handler is decorated with :py:func:`no_cors`, or if it was added
+    with `ctx_no_cors=True`, and is then bound to no resource. The paths of
+    exempt routes are also kept in `context.exempt_paths`, for requests which
+    fail routing, such as preflights to routes which do not accept OPTIONS.
+    """
+    bound = 0
+    for route in app.router.routes:
+        route_context = getattr(route, "ctx", None)
+        if route_context is None:
+            continue
+        exempt = _is_cors_exempt(route)
+        if not exempt and not route.static:
+            continue
+        path = '/' + route.path
+        binding = SimpleNamespace()
+        binding.context = context
+        binding.path = path
+        binding.exempt = exempt
+        if exempt:
+            binding.resource = binding.preflight_resource = None
         else:
-            resp = route(req, *request_args, **request_kw)
-            while isawaitable(resp):
-                resp = await resp
-            # resp can be `None` or `[]` if using Websockets
-            if not resp:
-                return None
-        try:
-            request_context = req.ctx
-        except (AttributeError, LookupError):
-            request_context = None
-        set_cors_headers(req, resp, request_context, options)
-        if request_context is not None:
-            setattr(request_context, SANIC_CORS_EVALUATED, "1")
+            binding.resource = context.resource_index.match(path)
+            binding.preflight_resource = context.preflight_index.match(path)
+        route_context.sanic_cors = binding
+        bound += 1
+    context.exempt_paths = _find_exempt_paths(app)
+    if context.debug_enabled:
+        context.log(logging.DEBUG, "Bound CORS resources to %d static routes", bound)
+
+
+def _match_request_resource(context, req, path, preflight=False, state=None):
+    """
+    Returns the resource which applies to a request, taking it from the
+    request's route if it was bound there by :py:func:`_bind_cors_routes`.
+    If the request's :py:class:`CorsRequestState` is given, the resource is
+    remembered on it, and only matched the first time for each context.
+    """
+    if state is not None and state.context is context:
+        if preflight and state.preflight_matched:
+            return state.preflight_resource
+        elif not preflight and state.resource_matched:
+            return state.resource
+    route = getattr(req, 'route', None)
+    binding = getattr(getattr(route, 'ctx', None), 'sanic_cors', None)
+    # The binding only applies to the route's own path, e.g. not when
+    # the request has a trailing slash and slashes are not strict.
+    if binding.exempt if binding is not None else (route is not None and _is_cors_exempt(route)):
+        # Routes are not bound when CORS is only on a blueprint
+        resource = None
+    elif binding is not None and binding.context is context and binding.path == path:
+        resource = binding.preflight_resource if preflight else binding.resource
+    else:
+        index = context.preflight_index if preflight else context.resource_index
+        resource = index.match_route(route, path)
+    if context.metrics is not None:
+        context.metrics.record_match(resource)
+    if state is not None:
+        if state.context is not context:
+            # Another CORS extension, with other resources, matched before
+            state.context = context
+            state.resource_matched = state.preflight_matched = False
+        if preflight:
+            state.preflight_resource = resource
+            state.preflight_matched = True
         else:
-            logging.log(logging.DEBUG, "Cannot access a sanic request "
-                        "context. Has request started? Is request ended?")
-        return resp
+            state.resource = resource
+            state.resource_matched = True
+    return resource
+
 
 def unapplied_cors_request_middleware(req, context=None):
     if req.method == 'OPTIONS':
-        try:
-            path = req.path
-        except AttributeError:
-            path = req.url
-        resources = context.resources
-        log = context.log
-        debug = partial(log, logging.DEBUG)
-        for res_regex, res_options in resources:
-            if res_options.get('automatic_options', True) and \
-                    try_match(path, res_regex):
-                debug("Request to '{:s}' matches CORS resource '{}'. "
-                      "Using options: {}".format(
-                        path, get_regexp_pattern(res_regex), res_options))
-                resp = response.HTTPResponse()
-
-                try:
-                    request_context = req.ctx
-                except (AttributeError, LookupError):
-                    request_context = None
-                    context.log(logging.DEBUG, "Cannot access a sanic request context. Has request started? Is request ended?")
-                set_cors_headers(req, resp, request_context, res_options)
-                if request_context is not None:
-                    setattr(request_context, SANIC_CORS_EVALUATED, "1")
-                return resp
-        else:
-            debug('No CORS rule matches')
+        return _make_preflight_response(context, req)
+
+
+def _make_preflight_response(context, req):
+    """
+    Returns the response to a CORS preflight request, or None if no resource
+    with automatic_options matches the request's path.
+    """
+    try:
+        path = req.path
+    except AttributeError:
+        path = req.url
+    try:
+        request_context = req.ctx
+    except (AttributeError, LookupError):
+        request_context = None
+        if context.debug_enabled:
+            context.log(logging.DEBUG, "Cannot access a sanic request context. Has request started? Is request ended?")
+    if _is_exempt_path(context, req, path):
+        return
+    state = get_request_state(request_context)
+    resource = _match_request_resource(context, req, path, preflight=True, state=state)
+    if resource is None:
+        if context.debug_enabled:
+            context.log(logging.DEBUG, 'No CORS rule matches')
+        return
+    res_regex, res_options = resource
+    if context.debug_enabled:
+        context.log(logging.DEBUG, "Request to '%s' matches CORS resource '%s'. Using options: %s",
+                    path, get_regexp_pattern(res_regex), res_options)
+    # The preflight headers are cached on the resource's policy, keyed on
+    # the Origin and the requested method and headers. A response object
+    # cannot be shared between requests, as later middleware may modify
+    # it, so a new one is made with the cached headers already in it.
+    metrics = context.metrics
+    if metrics is None:
+        headers = get_cors_header_items(res_options, req.headers, 'OPTIONS')
+    else:
+        start = perf_counter()
+        headers = get_cors_header_items(res_options, req.headers, 'OPTIONS')
+        metrics.record_headers(req, headers, perf_counter() - start)
+    resp = response.HTTPResponse(headers=headers)
+    if state is not None:
+        state.policy = res_options
+        state.headers = headers
+        state.evaluated = True
+    return resp
 
 
 async def unapplied_cors_response_middleware(req, resp, context=None):
     log = context.log
-    debug = partial(log, logging.DEBUG)
+    debug_enabled = context.debug_enabled
     # `resp` can be None or [] in the case of using Websockets
     if not resp:
         return False
+    # Routes exempt from CORS are marked when they are bound at startup,
+    # unless CORS is only on a blueprint
+    route = getattr(req, 'route', None)
+    binding = getattr(getattr(route, 'ctx', None), 'sanic_cors', None)
+    if binding.exempt if binding is not None else (route is not None and _is_cors_exempt(route)):
+        return
+    # Fast path for requests which are not CORS requests
+    if not context.always_send and 'Origin' not in req.headers:
+        if context.metrics is not None:
+            context.metrics.skipped += 1
+        return
     try:
         request_context = req.ctx
     except (AttributeError, LookupError):
-        debug("Cannot find the request context. Is request already finished? Is request not started?")
+        if debug_enabled:
+            log(logging.DEBUG, "Cannot find the request context. Is request already finished? Is request not started?")
         request_context = None
-    if request_context is not None:
+    state = get_request_state(request_context)
+    if state is not None:
         # If CORS headers are set in the CORS error handler
-        if getattr(request_context,
-                   SANIC_CORS_SKIP_RESPONSE_MIDDLEWARE, False):
-            debug('CORS was handled in the exception handler, skipping')
+        if state.error_handled:
+            if debug_enabled:
+                log(logging.DEBUG, 'CORS was handled in the exception handler, skipping')
             return False
 
         # If CORS headers are set in a view decorator, pass
-        elif getattr(request_context, SANIC_CORS_EVALUATED, False):
-            debug('CORS have been already evaluated, skipping')
+        elif state.evaluated:
+            if debug_enabled:
+                log(logging.DEBUG, 'CORS have been already evaluated, skipping')
             return False
     try:
         path = req.path
     except AttributeError:
         path = req.url
 
-    resources = context.resources
-    for res_regex, res_options in resources:
-        if try_match(path, res_regex):
-            debug("Request to '{}' matches CORS resource '{:s}'. Using options: {}".format(
-                  path, get_regexp_pattern(res_regex), res_options))
-            set_cors_headers(req, resp, request_context, res_options)
-            if request_context is not None:
-                setattr(request_context, SANIC_CORS_EVALUATED, "1")
-            break
-    else:
-        debug('No CORS rule matches')
+    resource = _match_request_resource(context, req, path, state=state)
+    if resource is None:
+        if debug_enabled:
+            log(logging.DEBUG, 'No CORS rule matches')
+        return
+    res_regex, res_options = resource
+    if debug_enabled:
+        log(logging.DEBUG, "Request to '%s' matches CORS resource '%s'. Using options: %s",
+            path, get_regexp_pattern(res_regex), res_options)
+    set_cors_headers(req, resp, request_context, res_options, context.metrics)
+    if state is not None:
+        state.evaluated = True
+
+def _make_cors_response_signal_handler(app, context=None):
+    """
+    Adds a handler of the `http.lifecycle.response` signal to the app, which
+    adds the CORS headers to each response in place of the response
+    middleware. The signal is dispatched after the response middleware has
+    run, just before the response is sent.
+    """
+    async def cors_response_signal(request, response):
+        await unapplied_cors_response_middleware(request, response, context=context)
+
+    app.signal("http.lifecycle.response")(cors_response_signal)
+    return cors_response_signal
+
 
 def _make_cors_request_middleware_function(app, context=None):
     """If app is a blueprint, this function is executed when the CORS extension is initialized, it can insert
@@ -389,6 +855,7 @@ def _make_cors_request_middleware_function(app, context=None):
         # Put at start of request middlewares
         app._future_middleware.insert(0, future_middleware)
         app.request_middleware.appendleft(new_mw)
+    return mw
 
 def _make_cors_response_middleware_function(app, context=None):
     """If app is a blueprint, this function is executed when the CORS extension is initialized, it can insert
@@ -398,7 +865,7 @@ def _make_cors_response_middleware_function(app, context=None):
     The exception is with Sanic v22.9+, middlwares are finalized _before_  the before_server_start event, so we must
     run this function at plugin initialization time, but v22.9+ has priorities, so it can be inserted with priority.
     """
-    mw = update_wrapper(partial(unapplied_cors_response_middleware, context=context), unapplied_cors_request_middleware)
+    mw = update_wrapper(partial(unapplied_cors_response_middleware, context=context), unapplied_cors_response_middleware)
     _old_name = getattr(mw, "__name__", None)
     if _old_name:
         setattr(mw, "__name__", str(_old_name).replace("unapplied_", ""))
@@ -421,6 +888,7 @@ def _make_cors_response_middleware_function(app, context=None):
         # Put at start of end of response middlewares
         app._future_middleware.append(future_middleware)
         app.response_middleware.append(new_mw)
+    return mw
 
 class CORSErrorHandler(ErrorHandler):
     @classmethod
@@ -429,25 +897,26 @@ class CORSErrorHandler(ErrorHandler):
             path = req.path
         except AttributeError:
             path = req.url
-        if path is not None:
-            resources = ctx.resources
+        if path is not None and (ctx.always_send or 'Origin' in req.headers) and \
+                not _is_exempt_path(ctx, req, path):
             log = ctx.log
-            debug = partial(log, logging.DEBUG)
             try:
                 request_context = req.ctx
             except (AttributeError, LookupError):
                 request_context = None
-            for res_regex, res_options in resources:
-                if try_match(path, res_regex):
-                    debug(
-                        "Request to '{:s}' matches CORS resource '{}'. "
-                        "Using options: {}".format(
-                            path, get_regexp_pattern(res_regex),
-                            res_options))
-                    set_cors_headers(req, resp, request_context, res_options)
-                    break
-            else:
-                debug('No CORS rule matches')
+            resource = _match_request_resource(ctx, req, path,
+                                               state=get_request_state(request_context))
+            if resource is None:
+                if ctx.debug_enabled:
+                    log(logging.DEBUG, 'No CORS rule matches')
+                return
+            res_regex, res_options = resource
+            if ctx.debug_enabled:
+                log(logging.DEBUG,
+                    "Request to '%s' matches CORS resource '%s'. "
+                    "Using options: %s",
+                    path, get_regexp_pattern(res_regex), res_options)
+            set_cors_headers(req, resp, request_context, res_options, ctx.metrics)
         else:
             pass
 
@@ -481,7 +950,7 @@ class CORSErrorHandler(ErrorHandler):
         # but that wasn't listed in methods, but we have automatic_options enabled
         if (req is not None and
               isinstance(e, MethodNotSupported) and req.method == "OPTIONS" and
-              opts.get('automatic_options', True)):
+              opts.automatic_options and not _is_exempt_path(ctx, req, req.path)):
             # A very specific set of requirements to trigger this kind of
             # automatic-options resp
             resp = response.HTTPResponse()
@@ -498,7 +967,7 @@ class CORSErrorHandler(ErrorHandler):
         # always apply CORS to them.
         if (req is not None and resp is not None) and \
                 (isinstance(e, exceptions.SanicException) or
-                 opts.get('intercept_exceptions', True)):
+                 opts.intercept_exceptions):
             try:
                 cls._apply_cors_to_exception(ctx, req, resp)
             except AttributeError:
@@ -520,8 +989,7 @@ class CORSErrorHandler(ErrorHandler):
                     "Is request already finished?")
             request_context = None
         if request_context is not None:
-            setattr(request_context,
-                    SANIC_CORS_SKIP_RESPONSE_MIDDLEWARE, "1")
+            get_request_state(request_context).error_handled = True
         return resp
 
     async def async_response(self, request, exception):
@@ -16,6 +16,8 @@ try:
 except ImportError:
     import unittest
 
+from types import SimpleNamespace
+
 from sanic_cors.core import *
 
 class InternalsTestCase(unittest.TestCase):
@@ -90,3 +92,252 @@ class InternalsTestCase(unittest.TestCase):
         self.assertTrue(probably_regex("http://[\w].example.com"))
         self.assertTrue(probably_regex("http://\w+.example.com"))
         self.assertTrue(probably_regex("https?://example.com"))
+
+    def test_serialize_options_policy(self):
+        policy = serialize_options({
+            'origins': ['http://foo.com', r'.*\.bar\.com'],
+            'methods': ['get', 'post'],
+            'max_age': 600,
+        })
+
+        self.assertIsInstance(policy, CorsPolicy)
+        self.assertTrue(policy.origins_regex)
+        self.assertTrue(policy.origins_vary)
+        self.assertFalse(policy.origins_wildcard)
+        self.assertEqual(policy.literal_origins, frozenset(['http://foo.com']))
+        self.assertEqual(policy.methods, frozenset(['GET', 'POST']))
+        self.assertEqual(policy.methods_header, 'GET, POST')
+        self.assertEqual(policy.max_age, '600')
+
+    def test_policy_dict_view(self):
+        policy = serialize_options({'origins': 'http://foo.com', 'methods': 'GET'})
+
+        self.assertEqual(policy['origins'], ['http://foo.com'])
+        self.assertEqual(policy.get('methods'), 'GET')
+        self.assertEqual(dict(policy), {'origins': ['http://foo.com'],
+                                        'allow_headers': [None],
+                                        'methods': 'GET'})
+        self.assertEqual(serialize_options(policy), policy)
+        with self.assertRaises(TypeError):
+            policy['origins'] = ['http://foo.com']
+        with self.assertRaises(AttributeError):
+            policy.origins_wildcard = False
+
+    def test_match_origin_literal_set(self):
+        origins = ['http://partner%d.com' % i for i in range(400)]
+        policy = serialize_options({'origins': origins + [r'https://.*\.example\.com']})
+
+        self.assertEqual(len(policy.literal_origins), 400)
+        self.assertEqual(len(policy.origin_regexes), 1)
+        self.assertTrue(policy.match_origin('http://partner399.com'))
+        self.assertTrue(policy.match_origin('HTTP://Partner7.com'))
+        self.assertTrue(policy.match_origin('https://api.example.com'))
+        self.assertFalse(policy.match_origin('http://partner400.com'))
+        for origin in ('http://partner1.com', 'https://a.example.com', 'http://foo.com'):
+            self.assertEqual(bool(policy.match_origin(origin)),
+                             bool(try_match_any(origin, policy.origins)))
+
+    def test_regex_set(self):
+        patterns = [r'.*\.example\.com', re.compile(r'http://example\d+\.com'),
+                    r'(www)\.\1\.com', r'https?://other\.com']
+        regexes = RegexSet(patterns)
+
+        # The back-reference cannot be combined, so is tried on its own.
+        self.assertEqual(len(regexes.separate), 1)
+        self.assertEqual(regexes.match('http://a.EXAMPLE.com'), patterns[0])
+        self.assertEqual(regexes.match('http://example1.com'), patterns[1])
+        self.assertEqual(regexes.match('www.www.com'), patterns[2])
+        self.assertEqual(regexes.match('HTTPS://other.com'), patterns[3])
+        self.assertIsNone(regexes.match('http://EXAMPLE1.com'))
+        self.assertIsNone(regexes.match('http://foo.com'))
+
+    def test_regex_set_global_flags(self):
+        patterns = [re.compile(r'http://Trusted\.com'), re.compile(r'(?i)http://other\.com')]
+        regexes = RegexSet(patterns)
+
+        # A global flag would apply to every pattern of the combined regex
+        self.assertEqual(len(regexes.separate), 1)
+        self.assertIsNone(regexes.match('http://trusted.com'))
+        self.assertEqual(regexes.match('http://Trusted.com'), patterns[0])
+        self.assertEqual(regexes.match('HTTP://OTHER.com'), patterns[1])
+        policy = serialize_options({'origins': patterns})
+        self.assertFalse(policy.match_origin('http://trusted.com'))
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b', 'missing'))
+        cache.put('c', 3)  # evicts 'a', the least recently used
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(cache.info(), dict(hits=2, misses=1, maxsize=2, currsize=2))
+
+    def test_origin_cache(self):
+        policy = serialize_options({'origins': ['http://foo.com', r'.*\.bar\.com'],
+                                    'cache_size': 2})
+
+        self.assertEqual(get_cors_origins(policy, 'http://foo.com'), ['http://foo.com'])
+        self.assertEqual(get_cors_origins(policy, 'http://foo.com'), ['http://foo.com'])
+        self.assertIsNone(get_cors_origins(policy, 'http://baz.com'))
+        self.assertIsNone(get_cors_origins(policy, 'http://baz.com'))
+        self.assertEqual(get_cors_origins(policy, 'http://a.bar.com'), ['http://a.bar.com'])
+        self.assertEqual((policy.origin_cache.hits, policy.origin_cache.misses), (2, 3))
+        self.assertEqual(len(policy.origin_cache), 2)
+
+        policy.clear_caches()
+        self.assertEqual(len(policy.origin_cache), 0)
+        self.assertIsNone(serialize_options({'cache_size': 0}).origin_cache)
+
+    def test_header_cache(self):
+        policy = serialize_options({'origins': ['http://foo.com', 'http://bar.com'],
+                                    'methods': ['GET', 'POST'],
+                                    'allow_headers': '*',
+                                    'max_age': 600,
+                                    'vary_header': True,
+                                    'cache_size': 256})
+        preflight = CIMultiDict([('Origin', 'http://foo.com'),
+                                 (ACL_REQUEST_METHOD, 'post'),
+                                 (ACL_REQUEST_HEADERS, 'X-Foo')])
+
+        headers = get_cors_header_items(policy, preflight, 'OPTIONS')
+        self.assertEqual(headers, ((ACL_ORIGIN, 'http://foo.com'),
+                                   (ACL_ALLOW_HEADERS, 'X-Foo'),
+                                   (ACL_MAX_AGE, '600'),
+                                   (ACL_METHODS, 'GET, POST'),
+                                   ('Vary', 'Origin')))
+        self.assertIs(get_cors_header_items(policy, preflight, 'OPTIONS'), headers)
+        self.assertEqual(get_cors_header_items(policy, preflight, 'GET'),
+                         ((ACL_ORIGIN, 'http://foo.com'), ('Vary', 'Origin')))
+        self.assertEqual(get_cors_header_items(policy, CIMultiDict(Origin='http://baz.com'), 'GET'), ())
+        self.assertEqual(policy.header_cache.info(),
+                         dict(hits=1, misses=3, maxsize=256, currsize=3))
+
+    def test_get_literal_prefix(self):
+        self.assertEqual(get_literal_prefix(r'/api/v2/.*'), '/api/v2/')
+        self.assertEqual(get_literal_prefix(r'/API/*'), '/api')
+        self.assertEqual(get_literal_prefix(r'/*'), '')
+        self.assertEqual(get_literal_prefix(r'/a|/b'), '')
+        self.assertEqual(get_literal_prefix(re.compile(r'/foo\w+')), '/foo')
+        self.assertEqual(get_literal_prefix(re.compile(r'/foo', re.VERBOSE)), '')
+
+    def test_resource_index(self):
+        resources = parse_resources(dict(
+            [(r'/api/v%d/.*' % i, {}) for i in range(60)] +
+            [(r'/api/*', {}),
+             (r'/Static', {}),
+             (re.compile(r'/Compiled/\d+'), {}),
+             (r'.*/health', {}),
+             (r'/*', {})]))
+        index = ResourceIndex(resources)
+
+        for path in ['/api/v2/users', '/api/v59/', '/api/v60/x', '/API/V7/x',
+                     '/static', '/static/', '/Compiled/1', '/compiled/1',
+                     '/foo/health', '/', '/ümlaut', '/api']:
+            expected = next((r for r in resources if try_match(path, r[0])), None)
+            self.assertEqual(index.match(path), expected, path)
+        self.assertIsNone(ResourceIndex(parse_resources(r'/api/.*')).match('/foo'))
+
+    def test_resource_index_route_cache(self):
+        resources = parse_resources({r'/api/special': {}, r'/api/.*': {}})
+        index = ResourceIndex(resources, route_cache=True)
+        static = SimpleNamespace(name='app.static', static=True, path='api/v1')
+        dynamic = SimpleNamespace(name='app.dynamic', static=False, path='api/<name>')
+
+        self.assertEqual(index.match_route(static, '/api/v1/'), resources[1])
+        self.assertEqual(index.routes, {})
+        self.assertEqual(index.match_route(static, '/api/v1'), resources[1])
+        self.assertEqual(index.routes, {'app.static': ('/api/v1', resources[1])})
+        self.assertEqual(index.match_route(dynamic, '/api/special'), resources[0])
+        self.assertEqual(index.match_route(dynamic, '/api/foo'), resources[1])
+        self.assertEqual(index.match_route(None, '/api/special'), resources[0])
+        self.assertEqual(list(index.routes), ['app.static'])
+        self.assertIsNone(ResourceIndex(resources).routes)
+
+    def test_no_origin_fast_path(self):
+        policy = serialize_options({'origins': 'http://foo.com', 'always_send': False,
+                                    'cache_size': 2})
+        self.assertEqual(get_cors_header_items(policy, CIMultiDict(), 'GET'), ())
+        self.assertEqual(len(policy.header_cache), 0)
+
+        policy = serialize_options({'origins': 'http://foo.com', 'always_send': True})
+        self.assertEqual(get_cors_header_items(policy, CIMultiDict(), 'GET'),
+                         ((ACL_ORIGIN, 'http://foo.com'),))
+
+    def test_no_origin_headers(self):
+        policy = serialize_options({'origins': ['http://foo.com', r'.*\.bar\.com', 'http://baz.com'],
+                                    'expose_headers': 'X-Foo',
+                                    'vary_header': True,
+                                    'always_send': True,
+                                    'cache_size': 2})
+        self.assertEqual(policy.always_send_origins, ('http://baz.com', 'http://foo.com'))
+        self.assertEqual(policy.no_origin_headers, ((ACL_ORIGIN, 'http://foo.com'),
+                                                    (ACL_EXPOSE_HEADERS, 'X-Foo'),
+                                                    ('Vary', 'Origin')))
+        self.assertIs(get_cors_header_items(policy, CIMultiDict(), 'GET'), policy.no_origin_headers)
+        self.assertEqual(len(policy.header_cache), 0)
+        self.assertEqual(get_cors_options(None, {'always_send': True}).always_send_origins, ('*',))
+        self.assertEqual(get_cors_options(None, {'always_send': False}).no_origin_headers, ())
+
+    def test_allow_headers_cache(self):
+        policy = serialize_options({'allow_headers': ['X-Foo', r'X-Bar-.*'], 'cache_size': 2})
+        self.assertFalse(policy.allow_headers_wildcard)
+        self.assertEqual(get_allow_headers(policy, 'x-bar-1, X-Baz,x-foo'), 'x-bar-1, x-foo')
+        self.assertEqual(get_allow_headers(policy, 'x-bar-1, X-Baz,x-foo'), 'x-bar-1, x-foo')
+        self.assertEqual(get_allow_headers(policy, 'X-Baz'), '')
+        self.assertEqual(policy.allow_headers_cache.info(),
+                         dict(hits=1, misses=2, maxsize=2, currsize=2))
+
+        policy = serialize_options({'allow_headers': '*'})
+        self.assertTrue(policy.allow_headers_wildcard)
+        self.assertEqual(get_allow_headers(policy, 'X-Foo , Content-Type'), 'Content-Type, X-Foo')
+        self.assertIsNone(get_allow_headers(policy, None))
+
+    def test_apply_cors_headers(self):
+        items = ((ACL_ORIGIN, 'http://foo.com'), ('Vary', 'Origin'))
+
+        headers = CIMultiDict([('vary', 'Accept-Encoding'), ('Vary', 'Cookie,Origin')])
+        apply_cors_headers(headers, items)
+        self.assertEqual(headers.getall('Vary'), ['Accept-Encoding, Cookie, Origin'])
+        self.assertEqual(headers.getall(ACL_ORIGIN), ['http://foo.com'])
+
+        headers = CIMultiDict()
+        apply_cors_headers(headers, items)
+        self.assertEqual(headers.getall('Vary'), ['Origin'])
+
+        headers = {'Vary': 'Accept-Encoding'}
+        apply_cors_headers(headers, items)
+        self.assertEqual(headers, {ACL_ORIGIN: 'http://foo.com',
+                                   'Vary': 'Accept-Encoding, Origin'})
+
+    def test_merge_vary(self):
+        self.assertEqual(merge_vary(['Origin'], 'Origin'), 'Origin')
+        self.assertEqual(merge_vary(['origin'], 'Origin'), 'origin')
+        self.assertEqual(merge_vary(['Accept-Encoding, ORIGIN ,Cookie'], 'Origin'),
+                         'Accept-Encoding, ORIGIN, Cookie')
+        self.assertEqual(merge_vary(['Cookie', 'accept, Accept', ''], 'Origin'),
+                         'Cookie, accept, Origin')
+        self.assertEqual(merge_vary(['*'], 'Origin'), '*')
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(),
+                         dict(buckets=[(1, 2), (10, 3), (float('inf'), 4)], count=4, sum=26.5))
+        histogram.clear()
+        self.assertEqual(histogram.snapshot()['count'], 0)
+
+    def test_request_state(self):
+        req_context = SimpleNamespace()
+        state = get_request_state(req_context)
+        self.assertFalse(state.evaluated)
+        self.assertFalse(state.resource_matched)
+        self.assertIs(get_request_state(req_context), state)
+        self.assertIsNone(get_request_state(None))
+
+        policy = serialize_options({'origins': 'http://foo.com', 'always_send': False})
+        req = SimpleNamespace(headers=CIMultiDict(Origin='http://foo.com'), method='GET')
+        set_cors_headers(req, SimpleNamespace(headers=CIMultiDict()), req_context, policy)
+        self.assertIs(state.policy, policy)
+        self.assertEqual(state.headers, ((ACL_ORIGIN, 'http://foo.com'),))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    test
+    ~~~~
+    Sanic-CORS is a simple extension to Sanic allowing you to support cross
+    origin resource sharing (CORS) using a simple decorator.
+
+    :copyright: (c) 2022 by Ashley Sommer (based on flask-cors by Cory Dolphin).
+    :license: MIT, see LICENSE for more details.
+"""
+
+from ..base_test import SanicCorsTestCase
+from sanic import Sanic
+from sanic.response import text
+from sanic_cors import *
+from sanic_cors.core import *
+
+
+class CompiledOptionsTestCase(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        self.app.config['CORS_ORIGINS'] = 'http://foo.com'
+
+        @self.app.route('/')
+        @cross_origin(self.app)
+        def index(request):
+            return text('Welcome!')
+
+        self.index = index
+
+    def test_compiled_at_decoration(self):
+        ''' The options are computed once, when the decorator is applied,
+            and cannot be modified afterwards.
+        '''
+        self.assertEqual(self.index.cors_options['origins'], ['http://foo.com'])
+        with self.assertRaises(TypeError):
+            self.index.cors_options['origins'] = ['http://bar.com']
+
+    def test_invalidate(self):
+        ''' Changing the app config has no effect until the decorated views
+            are invalidated.
+        '''
+        self.app.config['CORS_ORIGINS'] = 'http://bar.com'
+        resp = self.get('/', origin='http://bar.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+
+        invalidate_cross_origin(self.app)
+        resp = self.get('/', origin='http://bar.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+
+    def test_config_changed_between_views(self):
+        ''' Each view is compiled from the app config at the time it is
+            decorated.
+        '''
+        self.app.config['CORS_ORIGINS'] = 'http://only.com'
+
+        @self.app.route('/later')
+        @cross_origin(self.app)
+        def later(request):
+            return text('Welcome!')
+
+        self.assertEqual(later.cors_options['origins'], ['http://only.com'])
+        resp = self.get('/later', origin='http://evil.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+        resp = self.get('/later', origin='http://only.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://only.com')
+        self.assertEqual(self.index.cors_options['origins'], ['http://foo.com'])
+
+    def test_shared_compiler(self):
+        ''' Decorated views on one app share a single options compiler.
+        '''
+        from sanic_cors.decorator import get_cross_origin_compiler
+
+        @self.app.route('/other')
+        @cross_origin(self.app, origins='http://bar.com')
+        def other(request):
+            return text('Welcome!')
+
+        compiler = get_cross_origin_compiler(self.app)
+        self.assertEqual([view for view, _ in compiler.views], [self.index, other])
+        self.assertEqual(other.cors_options['origins'], ['http://bar.com'])
+        resp = self.get('/other', origin='http://bar.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -50,6 +50,11 @@ class VaryHeaderTestCase(SanicCorsTestCase):
         def test_existing_vary_headers(request):
             return HTTPResponse('', status=200, headers=CIMultiDict({'Vary': 'Accept-Encoding'}))
 
+        @self.app.route('/test_existing_vary_origin')
+        @cross_origin(self.app, origins=["http://foo.com", "http://bar.com"])
+        def test_existing_vary_origin(request):
+            return HTTPResponse('', status=200, headers=CIMultiDict({'Vary': 'origin, Cookie'}))
+
     def test_default(self):
         '''
             By default, allow all domains, which means the Vary:Origin header
@@ -108,5 +113,13 @@ class VaryHeaderTestCase(SanicCorsTestCase):
         self.assertEqual(varys,
                          set(['origin', 'accept-encoding']))
 
+    def test_existing_origin_not_repeated(self):
+        '''
+            If the Vary header already lists Origin, in any case, it is not
+            added again, and the existing tokens keep their order.
+        '''
+        resp = self.get('/test_existing_vary_origin', origin="http://foo.com")
+        self.assertEqual(resp.headers.get_list('Vary'), ['origin, Cookie'])
+
 if __name__ == "__main__":
     unittest.main()
@@ -11,7 +11,8 @@
 
 import re
 from ..base_test import SanicCorsTestCase
-from sanic import Sanic
+from sanic import Sanic, Blueprint
+from sanic.exceptions import ServerError
 from sanic.response import json, text
 
 from sanic_cors import *
@@ -392,5 +393,551 @@ class AppExtensionBadRegexp(SanicCorsTestCase):
             self.assertEqual(resp.status, 200)
 
 
+class AppExtensionRouteCache(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        self.bp = Blueprint('route_cache')
+        CORS(self.bp, route_cache=True, resources={
+            r'/api/special': {'origins': 'http://bar.com'},
+            r'/api/.*': {'origins': 'http://foo.com'},
+        })
+
+        @self.bp.route('/api/v1', methods=['GET', 'HEAD', 'OPTIONS'])
+        def static_route(request):
+            return text('Welcome')
+
+        @self.bp.route('/api/<name>', methods=['GET', 'HEAD', 'OPTIONS'])
+        def dynamic_route(request, name):
+            return text('Welcome')
+
+        self.app.blueprint(self.bp)
+
+    def test_static_route(self):
+        for _ in range(2):
+            for resp in self.iter_responses('/api/v1', origin='http://foo.com'):
+                self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        routes = self.bp.ctx.sanic_cors.resource_index.routes
+        self.assertEqual(list(routes), ['{}.route_cache.static_route'.format(self.app.name)])
+        self.assertEqual(list(routes.values())[0][1][0], r'/api/.*')
+
+    def test_trailing_slash(self):
+        for resp in self.iter_responses('/api/v1/', origin='http://foo.com'):
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_dynamic_route(self):
+        for resp in self.iter_responses('/api/foo', origin='http://foo.com'):
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        for resp in self.iter_responses('/api/special', origin='http://foo.com'):
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+        for resp in self.iter_responses('/api/special', origin='http://bar.com'):
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+        self.assertEqual(self.bp.ctx.sanic_cors.resource_index.routes, {})
+
+
+class AppExtensionStaticRouteBinding(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, route_cache=True, resources={r'/api/.*': {'origins': 'http://foo.com'}})
+
+        @self.app.route('/api/v1')
+        def static_route(request):
+            return text('Welcome')
+
+        @self.app.route('/api/<name>')
+        def dynamic_route(request, name):
+            return text('Welcome')
+
+    def test_static_route(self):
+        resp = self.get('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        # Static routes are bound to their resource at startup, so the
+        # route cache is not used on an app
+        self.assertIsNone(self.app.ctx.sanic_cors.resource_index.routes)
+        route = self.app.router.routes_all[('api', 'v1')]
+        self.assertEqual(route.ctx.sanic_cors.resource[0], r'/api/.*')
+        dynamic = [r for r in self.app.router.routes if not r.static]
+        self.assertFalse(hasattr(dynamic[0].ctx, 'sanic_cors'))
+
+
+class AppExtensionNoOrigin(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, always_send=False, resources={
+            r'/always': {'always_send': True, 'origins': 'http://foo.com'},
+            r'/.*': {},
+        })
+
+        @self.app.route('/always', methods=['GET', 'HEAD', 'OPTIONS'])
+        def always(request):
+            return text('Welcome')
+
+        @self.app.route('/other', methods=['GET', 'HEAD', 'OPTIONS'])
+        def other(request):
+            return text('Welcome')
+
+    def test_no_origin(self):
+        self.assertTrue(self.app.ctx.sanic_cors.always_send)
+        for resp in self.iter_responses('/other'):
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+        for resp in self.iter_responses('/always'):
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        for resp in self.iter_responses('/other', origin='http://bar.com'):
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+
+
+class AppExtensionPreflightCache(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, origins=['http://foo.com', 'http://bar.com'], max_age=600)
+
+        @self.app.route('/', methods=['GET', 'HEAD', 'OPTIONS'])
+        def index(request):
+            return text('Welcome')
+
+    def test_repeated_preflight(self):
+        headers = {ACL_REQUEST_METHOD: 'POST', ACL_REQUEST_HEADERS: 'X-Foo'}
+        for _ in range(3):
+            resp = self.options('/', origin='http://foo.com', headers=dict(headers))
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+            self.assertEqual(resp.headers.get(ACL_ALLOW_HEADERS), 'X-Foo')
+            self.assertEqual(resp.headers.get(ACL_MAX_AGE), '600')
+            self.assertEqual(resp.headers.get('Vary'), 'Origin')
+        policy = self.app.ctx.sanic_cors.preflight_index.match('/')[1]
+        self.assertEqual((policy.header_cache.hits, policy.header_cache.misses), (2, 1))
+
+
+class AppExtensionMetrics(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, metrics=True, always_send=False, resources={
+            r'/api/.*': {'origins': 'http://foo.com'},
+        })
+
+        @self.app.route('/api/v1', methods=['GET', 'OPTIONS'])
+        def api(request):
+            return text('Welcome')
+
+        # Dynamic, so that the CORS middleware is not left out of its route
+        @self.app.route('/other/<name>', methods=['GET'])
+        def other(request, name):
+            return text('Welcome')
+
+    def test_metrics(self):
+        self.get('/api/v1', origin='http://foo.com')
+        self.get('/api/v1', origin='http://bar.com')
+        self.options('/api/v1', origin='http://foo.com',
+                     headers={ACL_REQUEST_METHOD: 'GET'})
+        self.get('/api/v1')
+        self.get('/other/x', origin='http://foo.com')
+
+        metrics = self.app.ctx.sanic_cors.metrics.snapshot()
+        self.assertEqual(metrics['matches'], {r'/api/.*': 3})
+        self.assertEqual(metrics['unmatched'], 1)
+        self.assertEqual(metrics['skipped'], 1)
+        self.assertEqual(metrics['requests'], dict(simple=2, preflight=1))
+        self.assertEqual(metrics['origins'], dict(allowed=2, denied=1, absent=0))
+        timing = metrics['set_cors_headers_seconds']
+        self.assertEqual(timing['count'], 3)
+        self.assertEqual(timing['buckets'][-1], (float('inf'), 3))
+        self.assertEqual(metrics['caches'][r'/api/.*']['origin']['currsize'], 2)
+
+    def test_disabled(self):
+        app = Sanic(__name__.replace(".","-") + "-disabled")
+        CORS(app)
+        self.assertIsNone(app.ctx.sanic_cors.metrics)
+
+
+class AppExtensionPreflightRoutes(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, preflight_routes=True, resources={
+            r'/api/special': {'origins': 'http://bar.com'},
+            r'/api/.*': {'origins': 'http://foo.com'},
+        })
+
+        @self.app.route('/api/v1', methods=['GET', 'POST'])
+        def static_route(request):
+            return text('Welcome')
+
+        @self.app.route('/api/handled', methods=['GET', 'OPTIONS'])
+        def handled_route(request):
+            return text('Handled')
+
+        @self.app.route('/api/<name>')
+        def dynamic_route(request, name):
+            return text('Welcome')
+
+        @self.app.route('/other')
+        def other_route(request):
+            return text('Welcome')
+
+    def test_no_request_middleware(self):
+        self.get('/api/v1', origin='http://foo.com')
+        self.assertFalse(any(getattr(m.func, '__name__', None) == 'cors_request_middleware'
+                             for m in self.app.request_middleware))
+
+    def test_static_route(self):
+        resp = self.preflight('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.body, b'')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        self.assertTrue(ACL_METHODS in resp.headers)
+        resp = self.get('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.text, 'Welcome')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_route_handling_options(self):
+        resp = self.preflight('/api/handled', origin='http://foo.com')
+        self.assertEqual(resp.text, 'Handled')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_dynamic_route(self):
+        resp = self.preflight('/api/foo', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.preflight('/api/special', origin='http://bar.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+
+    def test_uncovered_route(self):
+        resp = self.preflight('/other', origin='http://foo.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+        names = [r.name for r in self.app.router.routes]
+        self.assertFalse(any('other_route_cors_preflight' in n for n in names))
+
+
+class AppExtensionSignals(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, signals=True, resources={
+            r'/api/.*': {'origins': 'http://foo.com'},
+        })
+
+        @self.app.route('/api/v1', methods=['GET', 'POST'])
+        def static_route(request):
+            return text('Welcome')
+
+        @self.app.route('/api/error')
+        def error_route(request):
+            raise ServerError("Broken")
+
+    def test_no_middleware(self):
+        self.get('/api/v1', origin='http://foo.com')
+        self.assertTrue(self.app.ctx.sanic_cors.signals)
+        names = [getattr(m.func, '__name__', None) for m in
+                 self.app.request_middleware + self.app.response_middleware]
+        self.assertFalse('cors_request_middleware' in names)
+        self.assertFalse('cors_response_middleware' in names)
+
+    def test_simple_request(self):
+        resp = self.get('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.text, 'Welcome')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.get('/api/v1', origin='http://bar.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+
+    def test_preflight(self):
+        resp = self.preflight('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        self.assertTrue(ACL_METHODS in resp.headers)
+
+    def test_exception(self):
+        resp = self.get('/api/error', origin='http://foo.com')
+        self.assertEqual(resp.status, 500)
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_default_uses_middleware(self):
+        app = Sanic(__name__.replace(".","-") + "-default")
+        CORS(app)
+        self.assertFalse(app.ctx.sanic_cors.signals)
+
+
+class AppExtensionMiddlewarePlan(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, metrics=True, resources={
+            r'/api/.*': {'origins': 'http://foo.com'},
+        })
+
+        @self.app.route('/api/v1', methods=['GET', 'OPTIONS'])
+        def covered(request):
+            return text('Welcome')
+
+        @self.app.route('/api/v2')
+        def no_options(request):
+            return text('Welcome')
+
+        @self.app.route('/other', methods=['GET', 'OPTIONS'])
+        def uncovered(request):
+            return text('Welcome')
+
+        @self.app.route('/decorated')
+        @cross_origin(self.app, origins='http://bar.com')
+        def decorated(request):
+            return text('Welcome')
+
+        @self.app.route('/api', strict_slashes=False)
+        def loose(request):
+            return text('Welcome')
+
+    def route_middleware(self, name):
+        route = self.app.router.name_index['{}.{}'.format(self.app.name, name)]
+        return ([getattr(m.func, '__name__', None) for m in route.extra.request_middleware],
+                [getattr(m.func, '__name__', None) for m in route.extra.response_middleware])
+
+    def test_pruned_routes(self):
+        self.get('/api/v1', origin='http://foo.com')
+        request_mw, response_mw = self.route_middleware('covered')
+        self.assertTrue('cors_request_middleware' in request_mw)
+        self.assertTrue('cors_response_middleware' in response_mw)
+        request_mw, response_mw = self.route_middleware('no_options')
+        self.assertFalse('cors_request_middleware' in request_mw)
+        self.assertTrue('cors_response_middleware' in response_mw)
+        request_mw, response_mw = self.route_middleware('uncovered')
+        self.assertFalse('cors_request_middleware' in request_mw)
+        self.assertFalse('cors_response_middleware' in response_mw)
+        request_mw, response_mw = self.route_middleware('decorated')
+        self.assertFalse('cors_response_middleware' in response_mw)
+        # Only '/api/' matches a resource, but requests to it use this route
+        request_mw, response_mw = self.route_middleware('loose')
+        self.assertTrue('cors_response_middleware' in response_mw)
+
+    def test_pruned_middleware_not_run(self):
+        ''' Sanic falls back to the app's middleware for a route with none,
+            which must not happen for the routes CORS was removed from.
+        '''
+        metrics = self.app.ctx.sanic_cors.metrics
+        self.get('/other', origin='http://foo.com')
+        self.get('/decorated', origin='http://bar.com')
+        self.assertEqual(metrics.unmatched, 0)
+        self.assertEqual(sum(metrics.matches.values()), 0)
+        self.get('/api/v2', origin='http://foo.com')
+        self.assertEqual(sum(metrics.matches.values()), 1)
+
+    def test_responses(self):
+        resp = self.preflight('/api/v1', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.preflight('/api/v2', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.get('/api/v2', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.get('/other', origin='http://foo.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+        resp = self.get('/decorated', origin='http://bar.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bar.com')
+        resp = self.get('/api/', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.get('/api', origin='http://foo.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+
+
+class AppExtensionNoAutomaticOptions(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, automatic_options=False)
+
+        @self.app.route('/', methods=['GET', 'OPTIONS'])
+        def index(request):
+            return text('Welcome')
+
+    def test_no_request_middleware(self):
+        resp = self.get('/', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        context = self.app.ctx.sanic_cors
+        self.assertFalse(context.needs_request_middleware)
+        self.assertTrue(context.needs_response_middleware)
+        self.assertFalse(any(getattr(m.func, '__name__', None) == 'cors_request_middleware'
+                             for m in self.app.request_middleware))
+
+
+class AppExtensionNoCors(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, resources={r'/.*': {'origins': 'http://foo.com'}})
+
+        @self.app.route('/health', methods=['GET', 'OPTIONS'])
+        @no_cors
+        def health(request):
+            return text('OK')
+
+        @self.app.route('/status')
+        @no_cors
+        def status(request):
+            return text('OK')
+
+        @self.app.route('/metrics/<name>', ctx_no_cors=True)
+        def metrics(request, name):
+            return text('OK')
+
+        @self.app.route('/version', ctx_no_cors=True)
+        def version(request):
+            return text('OK')
+
+        @self.app.route('/error')
+        @no_cors
+        def error(request):
+            raise ServerError("Broken")
+
+        @self.app.route('/api')
+        def api(request):
+            return text('Welcome')
+
+    def test_exempt_routes(self):
+        for resp in self.iter_responses('/health', verbs=['get', 'options'], origin='http://foo.com'):
+            self.assertEqual(resp.status, 200)
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+        resp = self.preflight('/health', origin='http://foo.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+        resp = self.get('/metrics/requests', origin='http://foo.com')
+        self.assertEqual(resp.text, 'OK')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+        resp = self.get('/error', origin='http://foo.com')
+        self.assertEqual(resp.status, 500)
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+
+    def test_exempt_routes_without_options(self):
+        for path in ('/status', '/version', '/status/'):
+            resp = self.get(path, origin='http://foo.com')
+            self.assertEqual(resp.status, 200)
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+            resp = self.preflight(path, origin='http://foo.com')
+            self.assertEqual(resp.status, 405)
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+            self.assertFalse(ACL_METHODS in resp.headers)
+
+    def test_other_routes(self):
+        resp = self.get('/api', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        resp = self.preflight('/api', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_route_binding(self):
+        self.get('/api', origin='http://foo.com')
+        dynamic = [r for r in self.app.router.routes if not r.static]
+        self.assertTrue(dynamic[0].ctx.sanic_cors.exempt)
+        self.assertIsNone(dynamic[0].ctx.sanic_cors.resource)
+
+
+class BlueprintExtensionNoCors(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        bp = Blueprint('no_cors')
+        CORS(bp, origins='http://foo.com')
+
+        @bp.get('/health')
+        @no_cors
+        def health(request):
+            return text('OK')
+
+        @bp.route('/version', methods=['GET', 'OPTIONS'], ctx_no_cors=True)
+        def version(request):
+            return text('OK')
+
+        @bp.get('/api')
+        def api(request):
+            return text('Welcome')
+
+        self.app.blueprint(bp)
+
+    def test_exempt_routes(self):
+        for path in ('/health', '/version'):
+            resp = self.get(path, origin='http://foo.com')
+            self.assertEqual(resp.text, 'OK')
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+            resp = self.preflight(path, origin='http://foo.com')
+            self.assertFalse(ACL_ORIGIN in resp.headers)
+            self.assertFalse(ACL_METHODS in resp.headers)
+
+    def test_other_routes(self):
+        resp = self.get('/api', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+
+class AppExtensionRequestState(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        CORS(self.app, metrics=True, origins='http://foo.com')
+        self.states = []
+
+        @self.app.route('/error', methods=['GET'])
+        def error(request):
+            self.states.append(request.ctx)
+            raise ServerError("example")
+
+    def test_matched_once(self):
+        resp = self.get('/error', origin='http://foo.com')
+        self.assertEqual(resp.status, 500)
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        state = getattr(self.states[0], SANIC_CORS_STATE)
+        self.assertTrue(state.error_handled)
+        self.assertTrue(state.resource_matched)
+        self.assertEqual(state.headers, ((ACL_ORIGIN, 'http://foo.com'),))
+        self.assertEqual(sum(self.app.ctx.sanic_cors.metrics.matches.values()), 1)
+
+
+class AppAndBlueprintExtension(SanicCorsTestCase):
+    def setUp(self):
+        self.app = Sanic(__name__.replace(".","-"))
+        bp = Blueprint('app_and_blueprint')
+        CORS(bp, resources={r'/api/.*': {'origins': 'http://bp.com'}})
+
+        @bp.get('/api/<name>')
+        def api(request, name):
+            return text('Welcome')
+
+        CORS(self.app, resources={r'/nothing/.*': {}})
+        self.app.blueprint(bp)
+
+    def test_blueprint_resources(self):
+        ''' The app's CORS matching no resource does not stop the blueprint's
+            CORS from matching its own.
+        '''
+        resp = self.get('/api/x', origin='http://bp.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://bp.com')
+        resp = self.get('/api/x', origin='http://other.com')
+        self.assertFalse(ACL_ORIGIN in resp.headers)
+
+
+class AppExtensionDebugLogging(SanicCorsTestCase):
+    def test_debug_enabled(self):
+        from sanic.log import logger
+        level = logger.level
+        self.addCleanup(logger.setLevel, level)
+        for enabled, log_level in [(False, logging.INFO), (True, logging.DEBUG)]:
+            self.app = Sanic(__name__.replace(".","-"))
+            logger.setLevel(log_level)
+            CORS(self.app)
+            self.assertEqual(self.app.ctx.sanic_cors.debug_enabled, enabled)
+
+            @self.app.route('/', methods=['GET', 'HEAD', 'OPTIONS'])
+            def index(request):
+                return text('Welcome')
+
+            self.test_client = self.app.test_client
+            for resp in self.iter_responses('/', origin='http://foo.com'):
+                self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+
+    def test_blueprint_debug_enabled(self):
+        from sanic.log import logger
+        level = logger.level
+        self.addCleanup(logger.setLevel, level)
+        self.app = Sanic(__name__.replace(".","-"))
+        bp = Blueprint('debug_logging')
+        logger.setLevel(logging.INFO)
+        CORS(bp)
+
+        @bp.route('/')
+        def index(request):
+            return text('Welcome')
+
+        self.app.blueprint(bp)
+        self.assertFalse(bp.ctx.sanic_cors.debug_enabled)
+        # e.g. app.run(debug=True) sets the level once the app is created
+        logger.setLevel(logging.DEBUG)
+        resp = self.get('/', origin='http://foo.com')
+        self.assertEqual(resp.headers.get(ACL_ORIGIN), 'http://foo.com')
+        self.assertTrue(bp.ctx.sanic_cors.debug_enabled)
+
+
 if __name__ == "__main__":
     unittest.main()